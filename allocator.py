@@ -0,0 +1,101 @@
+from collections import deque
+from datetime import date, timedelta
+
+import finance
+from db import immediate
+
+# ==========================================
+# BULK APPROVALS & SEAT ALLOCATOR
+# ==========================================
+JOIN_FEE = 800
+PLAN_DAYS = 30
+
+# fill: 'row' walks each floor row by row, 'column' column by column.
+# group_by_exam: seat students of the same exam next to each other.
+# lockers: give has_locker seats to students who asked for one, and plain seats to the
+# rest while plain seats last.
+DEFAULT_POLICY = {'fill': 'row', 'group_by_exam': True, 'lockers': True}
+
+FILL_ORDER = {'row': "floor, row_no, col_no, seat_id", 'column': "floor, col_no, row_no, seat_id"}
+
+class FreeSeats:
+    """In-memory index of free seats, split by locker and kept in fill order."""
+    def __init__(self, rows, lockers=True):
+        self.lockers = lockers
+        self.pools = {True: deque(), False: deque()}
+        for seat_id, label, has_locker in rows:
+            self.pools[bool(has_locker) if lockers else False].append((seat_id, label))
+
+    def __len__(self):
+        return len(self.pools[True]) + len(self.pools[False])
+
+    def take(self, wants_locker):
+        first = self.pools[bool(wants_locker)]
+        other = self.pools[not wants_locker]
+        if first: return first.popleft(), False
+        if other: return other.popleft(), self.lockers and bool(wants_locker)
+        return None, False
+
+def free_seats(conn, policy=None):
+    policy = {**DEFAULT_POLICY, **(policy or {})}
+    rows = conn.execute(f"""SELECT seat_id, seat_label, has_locker FROM seats
+        WHERE status='Available' AND seat_id NOT IN (SELECT assigned_seat_id FROM students WHERE assigned_seat_id IS NOT NULL)
+        ORDER BY {FILL_ORDER[policy['fill']]}""").fetchall()
+    return FreeSeats(rows, policy['lockers'])
+
+def _approve(conn, student_ids, today):
+    due = today + timedelta(days=PLAN_DAYS)
+    marks = ",".join("?" * len(student_ids))
+    rows = conn.execute(f"SELECT student_id, name FROM students WHERE student_id IN ({marks}) AND is_profile_approved=0", student_ids).fetchall()
+    conn.executemany("UPDATE students SET is_profile_approved=1, status='Active', due_date=? WHERE student_id=?", [(due, sid) for sid, _ in rows])
+    for _, name in rows: finance.record_income(conn, f"Join: {name}", JOIN_FEE, 'Fee', day=today)
+    return [sid for sid, _ in rows]
+
+def _allocate(conn, student_ids, policy):
+    report = {'assigned': [], 'conflicts': []}
+    marks = ",".join("?" * len(student_ids))
+    found = {r[0]: r for r in conn.execute(
+        f"SELECT student_id, name, exam, wants_locker, is_profile_approved, assigned_seat_id FROM students WHERE student_id IN ({marks})", student_ids)}
+    todo = []
+    for sid in student_ids:
+        row = found.get(sid)
+        if row is None: report['conflicts'].append((sid, None, "student not found"))
+        elif not row[4]: report['conflicts'].append((sid, row[1], "profile not approved"))
+        elif row[5] is not None: report['conflicts'].append((sid, row[1], "already has a seat"))
+        else: todo.append(row)
+    if policy['group_by_exam']: todo.sort(key=lambda r: (r[2] or '', r[0]))
+    seats = free_seats(conn, policy)
+    updates = []
+    for sid, name, exam, wants_locker, _, _ in todo:
+        seat, downgraded = seats.take(wants_locker)
+        if seat is None: report['conflicts'].append((sid, name, "no free seat left")); continue
+        if downgraded: report['conflicts'].append((sid, name, f"no locker seat left, gave {seat[1]}"))
+        updates.append((seat[0], sid)); report['assigned'].append((sid, name, seat[1]))
+    conn.executemany("UPDATE seats SET status='Occupied' WHERE seat_id=?", [(seat_id,) for seat_id, _ in updates])
+    conn.executemany("UPDATE students SET assigned_seat_id=?, is_seat_approved=1 WHERE student_id=?", updates)
+    return report
+
+def approve(conn, student_ids, allocate=True, policy=None, today=None):
+    """Approve pending students (join fee + first 30 days) and optionally seat them, all in
+    one BEGIN IMMEDIATE transaction. Returns {'approved', 'assigned', 'conflicts'}."""
+    student_ids = [int(s) for s in student_ids]
+    with immediate(conn):
+        approved = _approve(conn, student_ids, today or date.today())
+        report = _allocate(conn, approved, {**DEFAULT_POLICY, **(policy or {})}) if allocate and approved else {'assigned': [], 'conflicts': []}
+    report['approved'] = approved
+    return report
+
+def allocate(conn, student_ids, policy=None):
+    """Seat already-approved students by `policy` in one BEGIN IMMEDIATE transaction."""
+    with immediate(conn):
+        return _allocate(conn, [int(s) for s in student_ids], {**DEFAULT_POLICY, **(policy or {})})
+
+def assign_seat(conn, student_id, seat_label):
+    """Manual assignment. Returns None on success or the reason it was refused."""
+    with immediate(conn):
+        seat = conn.execute("SELECT seat_id FROM seats WHERE seat_label=? AND status='Available'", (seat_label,)).fetchone()
+        if seat is None: return f"{seat_label} was just taken"
+        if conn.execute("SELECT 1 FROM students WHERE student_id=? AND assigned_seat_id IS NULL", (student_id,)).fetchone() is None:
+            return "student already has a seat"
+        conn.execute("UPDATE seats SET status='Occupied' WHERE seat_id=?", (seat[0],))
+        conn.execute("UPDATE students SET assigned_seat_id=?, is_seat_approved=1 WHERE student_id=?", (seat[0], student_id))
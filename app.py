@@ -1,11 +1,30 @@
 import streamlit as st
 import sqlite3
+import tempfile
 import pandas as pd
 import os
 import random
 import time
 import altair as alt
+import functools
+import threading
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta
+from db import get_db
+from schema import migrate
+import allocator
+import branches
+import bulkio
+import docstore
+import dues
+import finance
+import outbox
+import profiler
+import queries
+import roster
+import seatmap
+import students
+import study
 
 # ==========================================
 # 1. CONFIGURATION & CSS MAGIC
@@ -26,99 +45,129 @@ st.markdown("""
 if not os.path.exists('data'): os.makedirs('data')
 if not os.path.exists('student_documents'): os.makedirs('student_documents')
 
-DB_NAME = 'data/smart_library_v18.db'
-
-def get_db():
-    return sqlite3.connect(DB_NAME, check_same_thread=False)
-
-def init_db():
-    conn = get_db()
-    c = conn.cursor()
-    
-    # 1. CORE
-    c.execute('''CREATE TABLE IF NOT EXISTS admins (username TEXT PRIMARY KEY, password TEXT, role TEXT)''')
-    c.execute("INSERT OR IGNORE INTO admins VALUES ('admin', 'admin123', 'Super')")
-    c.execute('''CREATE TABLE IF NOT EXISTS seats (seat_id INTEGER PRIMARY KEY AUTOINCREMENT, seat_label TEXT UNIQUE, has_locker INTEGER, status TEXT DEFAULT 'Available')''')
-    
-    # 2. STUDENTS
-    c.execute('''CREATE TABLE IF NOT EXISTS students (
-        student_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT, phone TEXT UNIQUE, password TEXT, exam TEXT,
-        email TEXT, father_name TEXT, guardian_phone TEXT, address TEXT,
-        photo_path TEXT, govt_id_path TEXT,
-        joining_date DATE, due_date DATE,
-        is_profile_approved INTEGER DEFAULT 0, is_seat_approved INTEGER DEFAULT 0,
-        assigned_seat_id INTEGER, mercy_days INTEGER DEFAULT 0,
-        status TEXT DEFAULT 'Pending',
-        xp_points INTEGER DEFAULT 0
-    )''')
-    
-    # 3. OPS & FINANCE
-    c.execute('''CREATE TABLE IF NOT EXISTS expenses (id INTEGER PRIMARY KEY AUTOINCREMENT, category TEXT, amount INTEGER, date DATE)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS income (id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT, amount INTEGER, date DATE, remarks TEXT, transaction_id TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS notices (id INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT, type TEXT, date DATE)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS notifications (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, message TEXT, date DATE, is_read INTEGER DEFAULT 0)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS seat_requests (req_id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, current_seat TEXT, requested_seat TEXT, reason TEXT, status TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS complaints (ticket_id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, category TEXT, priority TEXT, message TEXT, status TEXT DEFAULT 'Open', date DATE)''')
-    
-    # 4. PRODUCTIVITY & GUESTS
-    c.execute('''CREATE TABLE IF NOT EXISTS study_logs (log_id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, date DATE, start_time TIMESTAMP, end_time TIMESTAMP, duration_minutes INTEGER, session_type TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS tasks (task_id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, task TEXT, is_done INTEGER DEFAULT 0, date DATE)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS student_targets (student_id INTEGER PRIMARY KEY, daily_target_hours INTEGER DEFAULT 6)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS guests (guest_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, phone TEXT, date DATE, amount_paid INTEGER)''')
-
-    # Seed Seats
-    c.execute('SELECT count(*) FROM seats')
-    if c.fetchone()[0] == 0:
-        seats = [(f"A-{i}", 1 if i%5==0 else 0, 'Available') for i in range(1, 101)]
-        c.executemany('INSERT INTO seats (seat_label, has_locker, status) VALUES (?,?,?)', seats)
-    conn.commit()
-    conn.close()
-
-if not os.path.exists(DB_NAME): init_db()
+for b in branches.registered():
+    migrate(b.path); dues.start_scheduler(b.path); outbox.start_workers(b.path)
 
 # ==========================================
 # 2. HELPER FUNCTIONS
 # ==========================================
-def save_uploaded_file(uploaded_file, prefix):
-    if uploaded_file is not None:
-        file_path = f"student_documents/{prefix}_{uploaded_file.name}"
-        with open(file_path, "wb") as f: f.write(uploaded_file.getbuffer())
-        return file_path
-    return None
-
-def send_in_app_notification(student_id, message):
-    conn = get_db()
-    check = pd.read_sql(f"SELECT * FROM notifications WHERE student_id={student_id} AND message='{message}' AND date='{date.today()}'", conn)
-    if check.empty:
-        conn.execute("INSERT INTO notifications (student_id, message, date) VALUES (?,?,?)", (student_id, message, date.today()))
-        conn.commit()
-    conn.close()
-
-def check_lockout(student_id):
-    conn = get_db()
+_run = threading.local()
+
+@contextmanager
+def run_scope():
+    # The outermost scope owns the per-run memo: a full script run, or a fragment rerunning on its own
+    if getattr(_run, 'memo', None) is not None: yield; return
+    _run.memo = {}
+    try: yield
+    finally: _run.memo = None
+
+def per_run(fn):
+    # Read once per run and shared by the sidebar, header and the open tab; a fragment
+    # rerun reads it afresh, so nothing outlives the run that fetched it
+    @functools.wraps(fn)
+    def wrapper(*args):
+        memo = getattr(_run, 'memo', None)
+        if memo is None: return fn(*args)
+        key = (fn.__name__,) + args
+        if key not in memo: memo[key] = fn(*args)
+        return memo[key]
+    return wrapper
+
+def fragment(name, db=True):
+    # A tab or section that reruns on its own when its widgets change (st.fragment), timed as
+    # `name` and handed a connection to the current branch. Writes go through button callbacks
+    # or st.rerun(); scope="fragment" is refused while the fragment runs inside a full run.
+    def wrap(fn):
+        @st.fragment
+        @functools.wraps(fn)
+        def run():
+            with run_scope(), profiler.span(name, root=True):
+                if not db: return fn()
+                conn = branch_db()
+                try: fn(conn)
+                finally: conn.close()
+        return run
+    return wrap
+
+def callback(name):
+    # A widget callback: runs before its fragment reruns, on its own connection, timed as `name`
+    # (a root section, so it reads the same in full and fragment runs)
+    def wrap(fn):
+        @functools.wraps(fn)
+        def run(*args, **kw):
+            with profiler.span(name, root=True):
+                conn = branch_db()
+                try: fn(conn, *args, **kw)
+                finally: conn.close()
+        return run
+    return wrap
+
+@per_run
+def current_branch():
+    try: return branches.get(st.session_state.get('branch'))
+    except KeyError:
+        st.session_state['branch'] = None
+        if not st.session_state.get('user'): return branches.get()
+        # The branch left the registry mid-session: its user ids mean nothing in any other
+        # branch's database, so sign out rather than fall back (st.rerun() is a no-op in a callback)
+        st.session_state['user'] = st.session_state['role'] = st.session_state['selected_student_id'] = None
+        st.rerun(); raise
+
+def branch_db():
+    # Every page reads and writes the database of the branch picked at login
+    return get_db(current_branch().path)
+
+@per_run
+def current_student():
+    # Cached record from login/last run; re-read only if the row changed since. None logs out.
+    conn = branch_db()
+    try: user = st.session_state['user'] = students.refresh(conn, st.session_state['user'])
+    finally: conn.close()
+    return user
+
+def pick_branch(key):
+    found = branches.registered()
+    if len(found) == 1: return found[0].code
+    return st.selectbox("Branch", [b.code for b in found], format_func=lambda c: branches.get(c).name, key=key)
+
+def show_photo(path, width):
+    # Thumbnails are built once on disk and then served from memory (docstore.py)
+    if not path: return
+    thumb = docstore.thumbnail(path)
+    if thumb: st.image(thumb, width=width)
+
+def send_in_app_notification(student_id, message, conn=None):
+    # Pass the caller's connection when it already holds an open write, otherwise the
+    # second connection would wait on that lock until busy_timeout expires.
+    own = conn is None
+    if own: conn = branch_db()
     try:
-        s = pd.read_sql(f"SELECT * FROM students WHERE student_id={student_id}", conn).iloc[0]
-        if s['status'] == 'Active':
-            today = date.today()
-            try: due = datetime.strptime(str(s['due_date']), '%Y-%m-%d').date()
-            except: due = today
-            limit = due + timedelta(days=5 + int(s['mercy_days'] or 0))
-            if today > limit: return True, "⛔ ACCOUNT SUSPENDED: Dues Pending. Contact Admin."
-        elif s['status'] == 'Locked': return True, "⛔ ACCOUNT LOCKED"
-        return False, "Welcome"
-    except: return False, "Error"
-
-def update_xp(student_id, minutes):
-    conn = get_db()
-    conn.execute(f"UPDATE students SET xp_points = xp_points + {minutes} WHERE student_id={student_id}")
-    conn.commit(); conn.close()
+        # Queued, not written: the outbox workers deliver it (outbox.py); a repeat the same day is a no-op
+        outbox.enqueue(conn, 'inapp', student_id, message)
+        if own: conn.commit()
+    finally:
+        if own: conn.close()
+
+LOCKOUT_MESSAGES = {'suspended': "⛔ ACCOUNT SUSPENDED: Dues Pending. Contact Admin.", 'locked': "⛔ ACCOUNT LOCKED"}
+
+def check_lockout(student):
+    # dues_state is kept current by row triggers and the batch engine (dues.py); any change
+    # bumps row_version, so a refreshed Student record already carries the latest value
+    if student.dues_state in LOCKOUT_MESSAGES: return True, LOCKOUT_MESSAGES[student.dues_state]
+    return False, "Welcome"
+
+def update_xp(student_id, minutes, conn=None):
+    own = conn is None
+    if own: conn = branch_db()
+    conn.execute("UPDATE students SET xp_points = xp_points + ? WHERE student_id=?", (minutes, student_id))
+    if own: conn.commit(); conn.close()
 
 # ==========================================
 # 3. REGISTRATION
 # ==========================================
 def show_registration_page():
     st.header("📝 Join S-MART Elite")
+    st.session_state['branch'] = pick_branch("join_branch")
     with st.form("kyc"):
         c1, c2 = st.columns(2)
         name = c1.text_input("Name"); father = c2.text_input("Father Name")
@@ -127,14 +176,15 @@ def show_registration_page():
         pw = st.text_input("Password", type="password")
         c5, c6 = st.columns(2)
         photo = c5.file_uploader("Photo"); gid = c6.file_uploader("ID Proof")
+        locker = st.checkbox("🔐 I need a locker")
         
         if st.form_submit_button("Submit"):
-            conn = get_db()
+            conn = branch_db()
             try:
-                p_path = save_uploaded_file(photo, phone) if photo else None
-                g_path = save_uploaded_file(gid, phone) if gid else None
-                conn.execute("""INSERT INTO students (name, phone, password, exam, father_name, photo_path, govt_id_path, joining_date, status, xp_points) VALUES (?,?,?,?,?,?,?,?,?,?)""", 
-                             (name, phone, pw, exam, father, p_path, g_path, date.today(), 'Pending', 0))
+                p_path = docstore.save_upload(photo)
+                g_path = docstore.save_upload(gid)
+                conn.execute("""INSERT INTO students (name, phone, password, exam, father_name, photo_path, govt_id_path, joining_date, status, xp_points, wants_locker) VALUES (?,?,?,?,?,?,?,?,?,?,?)""", 
+                             (name, phone, pw, exam, father, p_path, g_path, date.today(), 'Pending', 0, int(locker)))
                 conn.commit(); st.success("Registered! Wait for Approval.")
             except: st.error("Phone used")
             conn.close()
@@ -142,241 +192,429 @@ def show_registration_page():
 # ==========================================
 # 4. ADMIN DASHBOARD (CRASH FIXED)
 # ==========================================
+def show_dossier(conn, sid):
+    stu = students.load(conn, sid)
+    if stu is None:
+        st.session_state['selected_student_id'] = None
+        st.rerun()
+
+    with st.sidebar, profiler.span('dossier'):
+        st.info("📂 Dossier")
+        show_photo(stu.photo_path, 150)
+        st.write(f"**{stu.name}**")
+        st.write(f"📞 {stu.phone}" + (f" • 🪑 {stu.seat_label}" if stu.seat_label else ""))
+        
+        due = stu.due or date.today()
+        days_left = (due - date.today()).days
+        
+        if days_left < 0: st.error(f"🔴 EXPIRED ({abs(days_left)} days ago)")
+        else: st.success(f"🔵 Active ({days_left} days)")
+
+        if st.button("💰 Renew (+30 Days)"):
+            new_due = due + timedelta(days=30)
+            tx_id = f"TXN{random.randint(10000,99999)}"
+            conn.execute("UPDATE students SET due_date=?, status='Active' WHERE student_id=?", (new_due, sid))
+            finance.record_income(conn, f"Fee: {stu.name}", 800, 'Monthly', tx_id)
+            send_in_app_notification(sid, f"Membership Renewed until {new_due}", conn)
+            conn.commit(); st.success("Renewed!"); st.rerun()
+            
+        if st.button("❌ Terminate"):
+            if stu.assigned_seat_id:
+                conn.execute("UPDATE seats SET status='Available' WHERE seat_id=?", (stu.assigned_seat_id,))
+            conn.execute("UPDATE students SET status='Alumni', assigned_seat_id=NULL WHERE student_id=?", (sid,))
+            conn.commit(); st.error("Terminated"); st.session_state['selected_student_id'] = None; st.rerun()
+
+        if st.button("Close"): st.session_state['selected_student_id'] = None; st.rerun()
+
 def show_admin_dashboard():
     # RESET SESSION IF ID IS INVALID
     if 'selected_student_id' not in st.session_state: st.session_state['selected_student_id'] = None
     st.sidebar.header("👮 Admin Command")
+    st.sidebar.caption(f"🏢 {current_branch().name}")
     
     # SIDEBAR DOSSIER (WITH CRASH PROTECTION)
     if st.session_state['selected_student_id']:
-        conn = get_db()
-        sid = st.session_state['selected_student_id']
-        
-        # *** FIX START: Check if student exists before accessing .iloc[0] ***
-        df = pd.read_sql(f"SELECT * FROM students WHERE student_id={sid}", conn)
-        
-        if df.empty:
-            st.session_state['selected_student_id'] = None
-            st.rerun()
-        
-        stu = df.iloc[0] # Safe to access now
-        # *** FIX END ***
-
-        with st.sidebar:
-            st.info("📂 Dossier")
-            if stu['photo_path']: st.image(stu['photo_path'], width=150)
-            st.write(f"**{stu['name']}**")
-            st.write(f"📞 {stu['phone']}")
-            
-            try: due = datetime.strptime(str(stu['due_date']), '%Y-%m-%d').date()
-            except: due = date.today()
-            days_left = (due - date.today()).days
-            
-            if days_left < 0: st.error(f"🔴 EXPIRED ({abs(days_left)} days ago)")
-            else: st.success(f"🔵 Active ({days_left} days)")
-
-            if st.button("💰 Renew (+30 Days)"):
-                new_due = due + timedelta(days=30)
-                tx_id = f"TXN{random.randint(10000,99999)}"
-                conn.execute("UPDATE students SET due_date=?, status='Active' WHERE student_id=?", (new_due, sid))
-                conn.execute("INSERT INTO income (source, amount, date, remarks, transaction_id) VALUES (?,?,?,?,?)", (f"Fee: {stu['name']}", 800, date.today(), 'Monthly', tx_id))
-                send_in_app_notification(sid, f"Membership Renewed until {new_due}")
-                conn.commit(); st.success("Renewed!"); st.rerun()
-                
-            if st.button("❌ Terminate"):
-                if stu['assigned_seat_id']:
-                    conn.execute("UPDATE seats SET status='Available' WHERE seat_id=?", (stu['assigned_seat_id'],))
-                conn.execute("UPDATE students SET status='Alumni', assigned_seat_id=NULL WHERE student_id=?", (sid,))
-                conn.commit(); st.error("Terminated"); st.session_state['selected_student_id'] = None; st.rerun()
-
-            if st.button("Close"): st.session_state['selected_student_id'] = None; st.rerun()
-        conn.close()
-
-    # TABS
-    t1, t2, t3, t4, t5 = st.tabs(["🗺️ Map", "👥 Database", "💰 Finance", "🎫 Complaints", "🚦 Approvals"])
-    conn = get_db()
-    
-    with t1: # MAP
-        st.subheader("Live Floor Plan")
-        st.caption("🔵 Safe (>7 Days) | 🟠 Expiring | 🔴 Expired | ⚪ Available")
-        seats = pd.read_sql("SELECT * FROM seats", conn)
-        students = pd.read_sql("SELECT student_id, assigned_seat_id, due_date FROM students WHERE assigned_seat_id IS NOT NULL", conn)
-        seat_data = {row['assigned_seat_id']: row for _, row in students.iterrows()}
-        
-        for r in range(0, 100, 10):
-            cols = st.columns(10)
-            for i in range(10):
-                if r+i < len(seats):
-                    s = seats.iloc[r+i]
-                    sid = s['seat_id']
-                    btn_type = "secondary"
-                    label = s['seat_label']
-                    if sid in seat_data:
-                        try:
-                            d_date = datetime.strptime(str(seat_data[sid]['due_date']), '%Y-%m-%d').date()
-                            days = (d_date - date.today()).days
-                            if days < 0: label = f"🔴 {label}"; btn_type="primary"
-                            elif days < 7: label = f"🟠 {label}"; btn_type="primary"
-                            else: label = f"🔵 {label}"; btn_type="primary"
-                        except: btn_type="primary"
-                    if cols[i].button(label, key=f"m_{sid}", type=btn_type):
-                        if sid in seat_data: st.session_state['selected_student_id'] = seat_data[sid]['student_id']; st.rerun()
-
-    with t2: # DATABASE
-        st.subheader("Master List")
-        filter_opt = st.radio("Filter", ["Active", "Defaulters", "All"], horizontal=True)
-        all_students = pd.read_sql("SELECT * FROM students WHERE status != 'Pending'", conn)
-        
-        for _, r in all_students.iterrows():
-            show = True
-            try:
-                dd = datetime.strptime(str(r['due_date']), '%Y-%m-%d').date()
-                if filter_opt == "Defaulters" and (dd - date.today()).days >= 5: show = False
-                if filter_opt == "Active" and (dd - date.today()).days < 0: show = False
-            except: pass
-            
-            if show:
-                with st.expander(f"{r['name']} - {r['phone']}"):
-                    c1, c2 = st.columns(2)
-                    if c1.button("📂 Open Dossier", key=f"od_{r['student_id']}"): st.session_state['selected_student_id'] = r['student_id']; st.rerun()
-                    msg = f"Dear {r['name']}, Fees Due."
-                    c2.link_button("🔔 WhatsApp Reminder", f"https://wa.me/91{r['phone']}?text={msg}")
-
-    with t3: # FINANCE
-        inc = pd.read_sql("SELECT sum(amount) FROM income", conn).iloc[0,0] or 0
-        exp = pd.read_sql("SELECT sum(amount) FROM expenses", conn).iloc[0,0] or 0
+        # st.rerun() raises, so the connection goes back to the pool in finally
+        conn = branch_db()
+        try: show_dossier(conn, st.session_state['selected_student_id'])
+        finally: conn.close()
+
+    # TABS: only the open one runs (on_change="rerun" gives each tab an .open flag), and
+    # each is a fragment, so its own widgets rerun just that tab
+    # Only super-admins (admins.role) see every branch and can add one
+    pages = {label: show for label, show in ADMIN_TABS.items() if show not in SUPER_TABS or st.session_state['role'] == 'Super'}
+    tabs = st.tabs(list(pages), key='admin_tab', on_change='rerun')
+    for tab, show in zip(tabs, pages.values()):
+        if tab.open:
+            with tab: show()
+
+@fragment('map')
+def admin_map(conn):
+    st.subheader("Live Floor Plan")
+    st.caption("🔵 Safe (>7 Days) | 🟠 Expiring | 🔴 Expired | ⚪ Available")
+    snap = seatmap.snapshot(conn)
+    floors = sorted(snap['floors'])
+    floor = st.radio("Floor", floors, horizontal=True, format_func=lambda f: f"Floor {f}") if len(floors) > 1 else next(iter(floors), None)
+    for row in snap['floors'].get(floor, []):
+        cols = st.columns(len(row))
+        for i, cell in enumerate(row):
+            if cell is None: continue
+            sid, label, state, student_id = cell
+            badge = seatmap.BADGES.get(state)
+            if cols[i].button(f"{badge} {label}" if badge else label, key=f"m_{sid}", type="secondary" if state == 'available' else "primary"):
+                if student_id is not None: st.session_state['selected_student_id'] = student_id; st.rerun()  # the dossier lives outside the fragment
+    with st.expander("➕ Add Floor"):
+        with st.form("add_floor"):
+            c1, c2, c3, c4 = st.columns(4)
+            f_no = c1.number_input("Floor", min_value=1, value=max(floors, default=0) + 1, help="An existing floor gets the new rows below its current ones"); f_rows = c2.number_input("Rows", min_value=1, value=10)
+            f_cols = c3.number_input("Columns", min_value=1, max_value=20, value=10); f_prefix = c4.text_input("Label Prefix", value=chr(ord('A') + len(floors)))
+            if st.form_submit_button("Create Seats"):
+                try: n = seatmap.add_floor(conn, int(f_no), int(f_rows), int(f_cols), f_prefix); conn.commit(); st.success(f"{n} seats added"); st.rerun()
+                except sqlite3.IntegrityError: conn.rollback(); st.error("Seat labels already exist")
+
+@fragment('database')
+def admin_database(conn):
+    st.subheader("Master List")
+    c1, c2 = st.columns([1, 2])
+    filter_opt = c1.radio("Filter", list(roster.FILTERS), horizontal=True)
+    search = c2.text_input("🔍 Search", placeholder="Name, phone, father name or exam")
+    if filter_opt == 'Defaulters':
+        c1, c2 = st.columns([2, 1])
+        channels = c1.multiselect("Channels", list(outbox.SENDERS), default=outbox.reminder_channels(), label_visibility="collapsed")
+        if c2.button("📣 Remind All Defaulters", disabled=not channels):
+            st.toast(f"{outbox.remind_defaulters(conn, channels)} reminder(s) queued")
+        counts = outbox.stats(conn)
+        st.caption("Outbox: " + " • ".join(f"{status} {sum(n for (_, s), n in counts.items() if s == status)}" for status in ('queued', 'sending', 'sent', 'failed')))
+    pager = st.session_state.get('roster_pager')
+    if not pager or pager['key'] != (filter_opt, search): pager = st.session_state['roster_pager'] = {'key': (filter_opt, search), 'cursors': [None]}
+    rows, next_cursor = roster.page(conn, filter_opt, search, after=pager['cursors'][-1])
+    if not rows: st.info("No students match.")
+
+    for student_id, name, phone, _, _ in rows:
+        with st.expander(f"{name} - {phone}"):
+            c1, c2 = st.columns(2)
+            if c1.button("📂 Open Dossier", key=f"od_{student_id}"): st.session_state['selected_student_id'] = student_id; st.rerun()
+            if 'whatsapp' not in outbox.SENDERS: c2.link_button("🔔 WhatsApp Reminder", f"https://wa.me/91{phone}?text=Dear {name}, Fees Due.")
+            elif c2.button("🔔 WhatsApp Reminder", key=f"wa_{student_id}"):
+                queued = outbox.enqueue(conn, 'whatsapp', student_id, f"Dear {name}, Fees Due."); conn.commit()
+                st.toast("Reminder queued" if queued else "Already reminded today")
+
+    c1, c2, c3 = st.columns([1, 2, 1])
+    if len(pager['cursors']) > 1: c1.button("⬅️ Prev", on_click=pager['cursors'].pop)
+    c2.caption(f"Page {len(pager['cursors'])}")
+    if next_cursor: c3.button("Next ➡️", on_click=pager['cursors'].append, args=(next_cursor,))
+
+    with st.expander("📦 Bulk Import / Export"):
+        show_bulk_io(conn)
+
+@fragment('finance')
+def admin_finance(conn):
+    board_box = st.container()  # filled last, so an entry submitted below is already in the totals
+    with st.form("add_inc"):
+        amt = st.number_input("Misc Income"); rem = st.text_input("Source")
+        if st.form_submit_button("Add Income"): finance.record_income(conn, 'Misc', amt, rem); conn.commit()
+    with st.form("add_exp"):
+        cat = st.selectbox("Category", ["Rent", "Elec", "Staff"]); amt = st.number_input("Amount")
+        if st.form_submit_button("Add Expense"): finance.record_expense(conn, cat, amt); conn.commit()
+
+    with board_box:
+        board = finance.dashboard(conn)
+        inc, exp = board['income'], board['expense']
         c1, c2, c3 = st.columns(3)
-        c1.metric("Income", f"₹{inc}"); c2.metric("Expense", f"₹{exp}"); c3.metric("Profit", f"₹{inc-exp}")
-        
-        with st.form("add_inc"):
-            amt = st.number_input("Misc Income"); rem = st.text_input("Source")
-            if st.form_submit_button("Add Income"):
-                conn.execute("INSERT INTO income (source, amount, date, remarks) VALUES (?,?,?,?)", ('Misc', amt, date.today(), rem)); conn.commit(); st.rerun()
-        with st.form("add_exp"):
-            cat = st.selectbox("Category", ["Rent", "Elec", "Staff"]); amt = st.number_input("Amount")
-            if st.form_submit_button("Add Expense"):
-                conn.execute("INSERT INTO expenses (category, amount, date) VALUES (?,?,?)", (cat, amt, date.today())); conn.commit(); st.rerun()
-
-    with t4: # COMPLAINTS
-        st.subheader("🎫 Complaint HQ")
-        tickets = pd.read_sql("SELECT * FROM complaints WHERE status='Open' ORDER BY ticket_id DESC", conn)
-        if tickets.empty: st.info("No open tickets.")
-        for _, t in tickets.iterrows():
-            st.error(f"[{t['priority']}] {t['category']}: {t['message']}")
-            if st.button("Mark Resolved", key=f"res_{t['ticket_id']}"):
-                conn.execute("UPDATE complaints SET status='Resolved' WHERE ticket_id=?", (t['ticket_id'],)); conn.commit(); st.rerun()
-
-    with t5: # APPROVALS
-        pending = pd.read_sql("SELECT * FROM students WHERE is_profile_approved=0", conn)
-        for _, p in pending.iterrows():
-            c1, c2 = st.columns([3,1])
-            c1.write(f"New: **{p['name']}**")
-            if c2.button("Approve", key=p['student_id']):
-                due = date.today() + timedelta(days=30)
-                conn.execute("UPDATE students SET is_profile_approved=1, status='Active', due_date=? WHERE student_id=?", (due, p['student_id']))
-                conn.execute("INSERT INTO income (source, amount, date, remarks) VALUES (?,?,?,?)", (f"Join: {p['name']}", 800, date.today(), 'Fee'))
-                conn.commit(); st.rerun()
-        
-        st.write("---")
-        seatless = pd.read_sql("SELECT * FROM students WHERE is_profile_approved=1 AND is_seat_approved=0", conn)
-        for _, s in seatless.iterrows():
+        c1.metric("Income", f"₹{inc:,.0f}"); c2.metric("Expense", f"₹{exp:,.0f}"); c3.metric("Profit", f"₹{inc-exp:,.0f}")
+        if board['charts']:
+            st.write("#### 📈 Month-over-Month P&L")
+            st.altair_chart(board['charts']['pnl'], width="stretch")
             c1, c2 = st.columns(2)
-            c1.write(f"Assign: **{s['name']}**")
-            avail = pd.read_sql("SELECT seat_label FROM seats WHERE status='Available'", conn)
-            sel = c2.selectbox("Seat", avail['seat_label'], key=f"ss_{s['student_id']}")
-            if c2.button("Confirm", key=f"cf_{s['student_id']}"):
-                sid = conn.execute(f"SELECT seat_id FROM seats WHERE seat_label='{sel}'").fetchone()[0]
-                conn.execute("UPDATE seats SET status='Occupied' WHERE seat_id=?", (sid,))
-                conn.execute("UPDATE students SET assigned_seat_id=?, is_seat_approved=1 WHERE student_id=?", (sid, s['student_id'])); conn.commit(); st.rerun()
-    conn.close()
+            c1.altair_chart(board['charts']['income'], width="stretch"); c2.altair_chart(board['charts']['expense'], width="stretch")
+
+@callback('complaints')
+def resolve_ticket(conn, ticket_id):
+    conn.execute("UPDATE complaints SET status='Resolved' WHERE ticket_id=?", (ticket_id,)); conn.commit()
+
+@fragment('complaints')
+def admin_complaints(conn):
+    st.subheader("🎫 Complaint HQ")
+    tickets = queries.open_tickets(conn)
+    if tickets.empty: st.info("No open tickets.")
+    for _, t in tickets.iterrows():
+        st.error(f"[{t['priority']}] {t['category']}: {t['message']}")
+        st.button("Mark Resolved", key=f"res_{t['ticket_id']}", on_click=resolve_ticket, args=(int(t['ticket_id']),))
+
+SEATLESS_ROWS = 25  # manual seat pickers shown at once; Auto-Seat All covers the rest
+
+@callback('approvals')
+def run_allocator(conn, job, *args, **kw):
+    # The fragment reruns right after and shows the report
+    st.session_state['alloc_report'] = job(conn, *args, **kw)
+
+def confirm_seat(conn, sid, name, seat_label):
+    why = allocator.assign_seat(conn, sid, seat_label)
+    return {'assigned': [] if why else [(sid, name, seat_label)], 'conflicts': [(sid, name, why)] if why else []}
+
+@fragment('approvals')
+def admin_approvals(conn):
+    report = st.session_state.pop('alloc_report', None)
+    if report:
+        if report.get('approved'): st.success(f"Approved {len(report['approved'])} student(s).")
+        if report['assigned']: st.success("Seated: " + ", ".join(f"{n} → {seat}" for _, n, seat in report['assigned']))
+        for _, n, why in report['conflicts']: st.warning(f"{n or 'Unknown'}: {why}")
+
+    with st.expander("⚙️ Allocation Policy"):
+        c1, c2, c3 = st.columns(3)
+        policy = {'fill': c1.radio("Fill seats", ["row", "column"], horizontal=True, format_func=lambda f: f"By {f}"),
+                  'group_by_exam': c2.checkbox("Group by exam", value=True),
+                  'lockers': c3.checkbox("Locker seats for locker requests", value=True)}
+
+    pending = queries.pending_students(conn)
+    if pending:
+        picked = []
+        for sid, name, exam, wants_locker in pending:
+            if st.checkbox(f"New: **{name}** ({exam}){' 🔐' if wants_locker else ''}", value=True, key=f"ap_{sid}"): picked.append(sid)
+        c1, c2 = st.columns(2)
+        c1.button(f"✅ Approve {len(picked)} + Auto-Seat", disabled=not picked, on_click=run_allocator, args=(allocator.approve, picked), kwargs={'allocate': True, 'policy': policy})
+        c2.button(f"Approve {len(picked)} Only", disabled=not picked, on_click=run_allocator, args=(allocator.approve, picked), kwargs={'allocate': False})
+
+    st.write("---")
+    seatless = queries.seatless_students(conn)
+    if seatless:
+        avail = queries.available_seat_labels(conn)  # once, not per student
+        st.button(f"🪑 Auto-Seat All {len(seatless)}", on_click=run_allocator, args=(allocator.allocate, [sid for sid, _ in seatless], policy))
+        if len(seatless) > SEATLESS_ROWS: st.caption(f"Assigning by hand: first {SEATLESS_ROWS} of {len(seatless)}")
+        for sid, name in seatless[:SEATLESS_ROWS]:
+            c1, c2 = st.columns(2)
+            c1.write(f"Assign: **{name}**")
+            sel = c2.selectbox("Seat", avail, key=f"ss_{sid}")
+            c2.button("Confirm", key=f"cf_{sid}", on_click=run_allocator, args=(confirm_seat, sid, name, sel))
+
+@fragment('branches', db=False)
+def show_branches_tab():
+    st.subheader("🏢 All Branches")
+    found = branches.registered()
+    t = time.perf_counter()
+    report = branches.consolidated(found)
+    st.caption(f"{len(found)} branch(es) in {(time.perf_counter() - t) * 1000:.0f} ms "
+               f"(slowest branch {max((r['ms'] for r in report['branches']), default=0):.0f} ms)")
+    for code, err in report['errors'].items(): st.error(f"{code}: {err}")
+    occ, pnl = report['occupancy'], report['pnl']
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Seats Occupied", f"{occ['Occupied'].sum():,} / {occ['Seats'].sum():,}")
+    c2.metric("Income", f"₹{pnl['Income'].sum():,.0f}"); c3.metric("Expense", f"₹{pnl['Expense'].sum():,.0f}"); c4.metric("Profit", f"₹{pnl['Profit'].sum():,.0f}")
+    st.write("#### 🪑 Occupancy"); st.dataframe(occ, hide_index=True)
+    st.write("#### ⏰ Dues (Active Students)"); st.dataframe(report['dues'], hide_index=True)
+    st.write("#### 💰 P&L"); st.dataframe(pnl, hide_index=True)
+    monthly = report['monthly']
+    if not monthly.empty:
+        net = monthly.assign(net=monthly['amount'].where(monthly['kind'] == 'income', -monthly['amount'])).groupby(['month', 'branch'], as_index=False)['net'].sum()
+        st.altair_chart(alt.Chart(net).mark_bar().encode(x=alt.X('month:O', title=None), y=alt.Y('net:Q', title='Profit (₹)'), color='branch:N',
+                                                         tooltip=['month', 'branch', alt.Tooltip('net:Q', format=',.0f')]).properties(height=280), width="stretch")
+    with st.expander("➕ Add Branch"):
+        with st.form("add_branch"):
+            c1, c2 = st.columns(2)
+            code = c1.text_input("Code", placeholder="e.g. north"); name = c2.text_input("Name", placeholder="North Campus")
+            c1, c2 = st.columns(2)
+            admin = c1.text_input("Branch admin username"); password = c2.text_input("Branch admin password", type="password", help="At least 8 characters")
+            if st.form_submit_button("Create Branch"):
+                try:
+                    b = branches.add(code, name, admin, password)
+                    dues.start_scheduler(b.path); outbox.start_workers(b.path)
+                    st.success(f"{b.name} created ({b.path}). Its admin signs in as {admin.strip()}."); st.rerun()
+                except ValueError as e: st.error(str(e))
+
+def export_file(path, table, fmt):
+    # Runs on its own thread when the download is clicked (no session state there); streams to a temp file in batches
+    conn = get_db(path)
+    try:
+        f = tempfile.TemporaryFile()
+        bulkio.export(conn, table, f, fmt); f.seek(0)
+        return f
+    finally: conn.close()
+
+UI_EXPORT_MAX_ROWS = 50_000  # a browser download is held in server memory; bigger tables go through manage.py
+
+def show_bulk_io(conn):
+    c1, c2 = st.columns(2)
+    with c1:
+        st.write("**Import**")
+        table = st.selectbox("Into", list(bulkio.TABLES), key="imp_table")
+        up = st.file_uploader("CSV or Parquet", type=["csv", "parquet"], key="imp_file")
+        if table == 'students': st.caption("Students need name, phone and password columns.")
+        dry = st.checkbox("Validate only", key="imp_dry")
+        if up and st.button("⬆️ Import"):
+            report = bulkio.import_file(conn, table, up, bulkio.guess_format(up.name), dry_run=dry)
+            (st.warning if report['failed'] else st.success)(f"{report['inserted']} row(s) {'valid' if dry else 'imported'}, {report['failed']} rejected.")
+            if report['errors']:
+                st.dataframe(pd.DataFrame(report['errors'][:200], columns=["Row", "Error"]), hide_index=True)
+                st.download_button("Download error report", bulkio.error_csv(report), f"{table}_errors.csv", "text/csv")
+    with c2:
+        st.write("**Export**")
+        table = st.selectbox("Table", list(bulkio.TABLES), key="exp_table")
+        fmt = st.radio("Format", bulkio.FORMATS, horizontal=True, key="exp_fmt")
+        rows = conn.execute(f"SELECT count(*) FROM (SELECT 1 FROM {table} LIMIT ?)", (UI_EXPORT_MAX_ROWS + 1,)).fetchone()[0]  # stops counting past the cap
+        if rows > UI_EXPORT_MAX_ROWS:
+            st.warning(f"{table} has more than {UI_EXPORT_MAX_ROWS:,} rows, too many to download here. Run `python manage.py --branch {current_branch().code} export {table} {table}.{fmt}` on the server.")
+        else:
+            st.download_button(f"⬇️ Download {table}.{fmt}", lambda path=current_branch().path: export_file(path, table, fmt), f"{table}_{date.today()}.{fmt}", on_click="ignore")
+            st.caption(f"Downloads are capped at {UI_EXPORT_MAX_ROWS:,} rows; `python manage.py export` writes any size straight to disk.")
+
+@fragment('performance')
+def show_performance_tab(conn):
+    st.subheader("⏱️ Performance")
+    c1, c2, c3 = st.columns(3)
+    on = c1.toggle("Profile queries & sections", value=profiler.enabled, help="Near-zero cost when off. Applies from the next rerun.")
+    slow = c2.number_input("Slow-query log threshold (ms)", min_value=1.0, value=float(profiler.SLOW_MS))
+    if on != profiler.enabled or slow != profiler.SLOW_MS: profiler.configure(on=on, slow_ms=slow); st.rerun()
+    if c3.button("🧹 Clear"): profiler.clear(); st.rerun()
+    if profiler.SLOW_LOG: st.caption(f"Statements over {profiler.SLOW_MS:.0f} ms are appended to `{profiler.SLOW_LOG}`.")
+    if not profiler.enabled and not profiler.queries: st.info("Profiling is off. Turn it on, then use the app for a while."); return
+
+    st.write("#### 🧱 Section Render Time")
+    sections = pd.DataFrame(profiler.section_times(), columns=["Section", "Renders", "Last ms", "Median ms", "Max ms"])
+    st.dataframe(sections.round(1), hide_index=True)
+
+    st.write("#### 🐢 Slowest Queries")
+    top_n = st.slider("Show", 5, 50, 10)
+    for sql, shape, calls, mean_ms, max_ms, rows, section in profiler.slowest(top_n):
+        with st.expander(f"{max_ms:.1f} ms max • {mean_ms:.1f} ms avg • {calls}× • {section or '-'} — {sql[:80]}"):
+            st.code(sql, language="sql")
+            st.caption(f"Params: {shape} • Rows (slowest call): {rows}")
+            plan = profiler.explain(conn, sql, shape)
+            if plan: st.code("\n".join(plan), language="text")
+
+ADMIN_TABS = {"🗺️ Map": admin_map, "👥 Database": admin_database, "💰 Finance": admin_finance, "🎫 Complaints": admin_complaints,
+              "🚦 Approvals": admin_approvals, "⏱️ Performance": show_performance_tab, "🏢 Branches": show_branches_tab}
+SUPER_TABS = (show_performance_tab, show_branches_tab)  # process-wide: the profiler sees every branch's SQL
 
 # ==========================================
 # 5. STUDENT DASHBOARD (PRESERVED V17)
 # ==========================================
-def show_student_dashboard(user):
-    is_locked, msg = check_lockout(user[0])
-    if is_locked: st.error(msg); st.stop()
+def show_student_dashboard():
+    user = current_student()
+    if user is None: st.rerun()
 
-    conn = get_db()
+    is_locked, msg = check_lockout(user)
+    if is_locked: st.error(msg); st.stop()
     
-    st.title(f"👋 {user[1]}")
+    st.title(f"👋 {user.name}")
     
     # 1. NOTICE
-    latest_notice = pd.read_sql("SELECT * FROM notices ORDER BY id DESC LIMIT 1", conn)
-    if not latest_notice.empty: 
-        st.markdown(f"<div class='notice-board'>📌 <b>NOTICE:</b> {latest_notice.iloc[0]['message']}</div>", unsafe_allow_html=True)
+    conn = branch_db()
+    latest_notice = queries.latest_notice(conn)
+    conn.close()
+    if latest_notice: 
+        st.markdown(f"<div class='notice-board'>📌 <b>NOTICE:</b> {latest_notice}</div>", unsafe_allow_html=True)
 
     # 2. MEMBERSHIP FLASHER
-    try:
-        due = datetime.strptime(str(user[12]), '%Y-%m-%d').date()
-        days_left = (due - date.today()).days
-    except: days_left = 30
+    days_left = user.days_left()
+    if days_left is None: days_left = 30
     
     col_flash, col_stats = st.columns([2, 1])
     with col_flash:
         if days_left < 0: st.error(f"⛔ MEMBERSHIP EXPIRED {abs(days_left)} DAYS AGO")
         elif days_left < 7:
             st.markdown(f"<div class='flash-alert'>⚠️ ONLY {days_left} DAYS LEFT! PLEASE RENEW.</div>", unsafe_allow_html=True)
-            send_in_app_notification(user[0], f"URGENT: Membership expires in {days_left} days.")
         else: st.success(f"✅ Membership Active: {days_left} Days Remaining")
 
-    with col_stats: st.metric("XP Points", f"{user[18]} ⭐")
+    with col_stats: st.metric("XP Points", f"{user.xp_points} ⭐")
 
-    tab1, tab2, tab3, tab4 = st.tabs(["🏠 Hub", "🎫 Complaint Desk", "⏱️ Focus OS", "🧘 Zen"])
-    
-    with tab1: # HUB
-        c1, c2 = st.columns([1, 2])
-        with c1:
-            if user[9]: st.image(user[9], width=180)
-            st.write(f"**Seat:** A-{user[15]}")
-        with c2:
-            st.markdown(f"""<div class="id-card"><h3>🆔 S-MART ELITE</h3><h2>{user[1]}</h2><p>Exam: {user[4]}</p><p>Valid Till: {user[12]}</p></div>""", unsafe_allow_html=True)
-            notifs = pd.read_sql(f"SELECT * FROM notifications WHERE student_id={user[0]} ORDER BY id DESC LIMIT 3", conn)
-            if not notifs.empty:
-                st.write("#### 🔔 Alerts")
-                for _, n in notifs.iterrows(): st.info(f"{n['message']}")
-
-    with tab2: # COMPLAINT
-        st.subheader("🎫 Support Center")
-        with st.expander("📝 Raise New Complaint"):
-            with st.form("comp_pro"):
-                c_a, c_b = st.columns(2)
-                cat = c_a.selectbox("Category", ["AC Cooling", "Cleanliness", "Noise", "WiFi", "Furniture", "Other"])
-                prio = c_b.selectbox("Priority", ["Low", "Medium", "High 🔥"])
-                message = st.text_area("Details") # Renamed 'msg' to 'message' to avoid conflict
-                if st.form_submit_button("Submit Ticket"):
-                    conn.execute("INSERT INTO complaints (student_id, category, priority, message, status, date) VALUES (?,?,?,?,?,?,?)", (user[0], cat, prio, message, 'Open', date.today())); conn.commit(); st.success("Created!")
-        
-        hist = pd.read_sql(f"SELECT * FROM complaints WHERE student_id={user[0]} ORDER BY ticket_id DESC", conn)
-        if not hist.empty:
-            for _, t in hist.iterrows():
-                icon = "🟢" if t['status'] == 'Resolved' else "🔴"
-                with st.container(border=True): st.markdown(f"**{icon} {t['category']}** ({t['priority']}) - {t['status']}")
-
-    with tab3: # FOCUS
-        st.subheader("🚀 Productivity")
-        if 'timer_state' not in st.session_state: st.session_state['timer_state'] = 'Idle'
-        
-        if st.session_state['timer_state'] == 'Idle':
-            if st.button("▶️ START SESSION", type="primary"):
-                st.session_state['timer_state'] = 'Studying'; st.session_state['start_time'] = datetime.now(); st.rerun()
-        elif st.session_state['timer_state'] == 'Studying':
-            st.success("🔥 FOCUSING...")
-            if st.button("⏹️ STOP & SAVE XP"):
-                end = datetime.now(); dur = (end - st.session_state['start_time']).total_seconds() / 60
-                conn.execute("INSERT INTO study_logs (student_id, date, start_time, end_time, duration_minutes, session_type) VALUES (?,?,?,?,?,?)", (user[0], str(date.today()), st.session_state['start_time'], end, int(dur), 'Study'))
-                update_xp(user[0], int(dur))
-                conn.commit(); st.session_state['timer_state'] = 'Idle'; st.balloons(); st.rerun()
-
-    with tab4: # ZEN
-        st.subheader("🧘 Zen Zone")
-        c1, c2 = st.columns(2)
-        with c1: st.link_button("🎵 Lo-Fi Beats", "https://www.youtube.com/watch?v=jfKfPfyJRdk")
-        with c2: st.link_button("🌧️ Rain Sounds", "https://www.youtube.com/watch?v=mPZkdNFkNps")
+    tabs = st.tabs(list(STUDENT_TABS), key='student_tab', on_change='rerun')
+    for tab, show in zip(tabs, STUDENT_TABS.values()):
+        if tab.open:
+            with tab: show()
 
-    conn.close()
     st.divider(); st.link_button("💬 Chat Admin", "https://wa.me/919999999999")
 
+@fragment('hub')
+def student_hub(conn):
+    user = current_student() or st.rerun()
+    c1, c2 = st.columns([1, 2])
+    with c1:
+        show_photo(user.photo_path, 180)
+        st.write(f"**Seat:** {user.seat_label or 'Not assigned'}")
+    with c2:
+        st.markdown(f"""<div class="id-card"><h3>🆔 S-MART ELITE</h3><h2>{user.name}</h2><p>Exam: {user.exam}</p><p>Valid Till: {user.due_date}</p></div>""", unsafe_allow_html=True)
+        notifs = queries.recent_notifications(conn, user.student_id)
+        if not notifs.empty:
+            st.write("#### 🔔 Alerts")
+            for _, n in notifs.iterrows(): st.info(f"{n['message']}")
+
+@fragment('complaint_desk')
+def student_complaints(conn):
+    user = current_student() or st.rerun()
+    st.subheader("🎫 Support Center")
+    with st.expander("📝 Raise New Complaint"):
+        with st.form("comp_pro"):
+            c_a, c_b = st.columns(2)
+            cat = c_a.selectbox("Category", ["AC Cooling", "Cleanliness", "Noise", "WiFi", "Furniture", "Other"])
+            prio = c_b.selectbox("Priority", ["Low", "Medium", "High 🔥"])
+            message = st.text_area("Details") # Renamed 'msg' to 'message' to avoid conflict
+            if st.form_submit_button("Submit Ticket"):
+                conn.execute("INSERT INTO complaints (student_id, category, priority, message, status, date) VALUES (?,?,?,?,?,?)", (user.student_id, cat, prio, message, 'Open', date.today())); conn.commit(); st.success("Created!")
+    
+    hist = queries.ticket_history(conn, user.student_id)
+    if not hist.empty:
+        for _, t in hist.iterrows():
+            icon = "🟢" if t['status'] == 'Resolved' else "🔴"
+            with st.container(border=True): st.markdown(f"**{icon} {t['category']}** ({t['priority']}) - {t['status']}")
+
+def start_focus():
+    st.session_state['timer_state'] = 'Studying'; st.session_state['start_time'] = datetime.now()
+
+@fragment('focus_timer')
+def focus_timer(conn):
+    # Starting costs no queries: only this fragment reruns. Stopping changes XP and the
+    # stats around it, so that one reruns the page.
+    if st.session_state.setdefault('timer_state', 'Idle') == 'Idle':
+        st.button("▶️ START SESSION", type="primary", on_click=start_focus)
+    else:
+        user = current_student() or st.rerun()
+        st.success(f"🔥 FOCUSING... since {st.session_state['start_time']:%H:%M}")
+        if st.button("⏹️ STOP & SAVE XP"):
+            end = datetime.now(); dur = (end - st.session_state['start_time']).total_seconds() / 60
+            conn.execute("INSERT INTO study_logs (student_id, date, start_time, end_time, duration_minutes, session_type) VALUES (?,?,?,?,?,?)", (user.student_id, str(date.today()), st.session_state['start_time'], end, int(dur), 'Study'))
+            update_xp(user.student_id, int(dur), conn)
+            conn.commit(); st.session_state['timer_state'] = 'Idle'; st.balloons(); st.rerun()
+
+@callback('focus')
+def save_target(conn, student_id):
+    study.set_target(conn, student_id, int(st.session_state['target_hrs'])); conn.commit()
+
+@fragment('focus')
+def student_focus(conn):
+    user = current_student() or st.rerun()
+    st.subheader("🚀 Productivity")
+    focus_timer()
+
+    stats = study.summary(conn, user.student_id)
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Today", f"{stats['today_minutes'] / 60:.1f} / {stats['target_minutes'] / 60:.0f} h")
+    c2.metric("🔥 Streak", f"{stats['current_streak']} days", help=f"Longest: {stats['longest_streak']} days")
+    c3.metric("This Week", f"{stats['week_minutes'] / 60:.1f} h", help=f"Target hit on {stats['week_target_days']} of 7 days")
+    c4.metric("XP Rank", f"#{study.xp_rank(conn, user.xp_points)}")
+    st.progress(min(stats['today_minutes'] / stats['target_minutes'], 1.0) if stats['target_minutes'] else 0.0)
+    st.altair_chart(study.heatmap_chart(stats['frame']), width="stretch")
+    with st.expander("🎯 Daily Target"):
+        st.number_input("Hours per day", min_value=1, max_value=16, value=stats['target_minutes'] // 60, key="target_hrs")
+        st.button("Save Target", on_click=save_target, args=(user.student_id,))
+
+    c1, c2 = st.columns(2)
+    with c1:
+        st.write("#### 🏆 XP Leaderboard")
+        st.dataframe(pd.DataFrame(study.leaderboard(conn), columns=["Name", "Exam", "XP"]), hide_index=True)
+    with c2:
+        st.write("#### 📅 This Week")
+        week = pd.DataFrame(study.weekly_leaderboard(conn), columns=["Name", "Exam", "Minutes"])
+        st.dataframe(week.assign(Hours=(week.pop("Minutes") / 60).round(1)), hide_index=True)
+
+@fragment('zen', db=False)
+def student_zen():
+    st.subheader("🧘 Zen Zone")
+    c1, c2 = st.columns(2)
+    with c1: st.link_button("🎵 Lo-Fi Beats", "https://www.youtube.com/watch?v=jfKfPfyJRdk")
+    with c2: st.link_button("🌧️ Rain Sounds", "https://www.youtube.com/watch?v=mPZkdNFkNps")
+
+STUDENT_TABS = {"🏠 Hub": student_hub, "🎫 Complaint Desk": student_complaints, "⏱️ Focus OS": student_focus, "🧘 Zen": student_zen}
+
 # ==========================================
 # 6. ROUTER
 # ==========================================
@@ -384,29 +622,33 @@ def main():
     if 'user' not in st.session_state: st.session_state['user'] = None
     if st.session_state['user']:
         if st.sidebar.button("Logout"): st.session_state['user'] = None; st.rerun()
-        if st.session_state['role'] == 'Super': show_admin_dashboard()
-        else: show_student_dashboard(st.session_state['user'])
+        role = st.session_state['role']
+        with run_scope(), profiler.span('student' if role == 'Student' else 'admin'):
+            if role == 'Student': show_student_dashboard()
+            else: show_admin_dashboard()
     else:
         menu = st.sidebar.radio("Menu", ["🏠 Home", "📝 Join", "🔐 Login"])
         if menu == "🏠 Home": 
             st.title("S-MART Library"); st.image("https://images.unsplash.com/photo-1497366216548-37526070297c?q=80&w=1200")
             st.success("World Class Facilities • Silent Zone • 24/7 Access")
-        elif menu == "📝 Join": show_registration_page()
+        elif menu == "📝 Join":
+            with profiler.span('join'): show_registration_page()
         elif menu == "🔐 Login":
-            st.header("Login"); role = st.selectbox("Role", ["Student", "Admin"]); u = st.text_input("User/Phone"); p = st.text_input("Password", type="password")
+            st.header("Login"); st.session_state['branch'] = pick_branch("login_branch")
+            role = st.selectbox("Role", ["Student", "Admin"]); u = st.text_input("User/Phone"); p = st.text_input("Password", type="password")
             if st.button("Enter"):
-                conn = get_db()
+                with profiler.span('login'):
+                    conn = branch_db()
+                    try: user = queries.admin_login(conn, u, p) if role == 'Admin' else students.login(conn, u, p)
+                    finally: conn.close()
                 if role == 'Admin':
-                    user = conn.execute("SELECT * FROM admins WHERE username=? AND password=?", (u,p)).fetchone()
-                    if user: st.session_state['user'] = user; st.session_state['role'] = 'Super'; st.rerun()
+                    if user: st.session_state['user'] = user; st.session_state['role'] = user[1] or 'Admin'; st.rerun()
                     else: st.error("Bad Admin Pass")
                 else:
-                    user = conn.execute("SELECT * FROM students WHERE phone=? AND password=?", (u,p)).fetchone()
                     if user:
-                        if user[13] == 0: st.warning("Pending Approval")
+                        if user.is_profile_approved == 0: st.warning("Pending Approval")
                         else: st.session_state['user'] = user; st.session_state['role'] = 'Student'; st.rerun()
                     else: st.error("User not found")
-                conn.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,53 @@
+"""Cross-branch report: concurrent vs one branch after another.
+
+    python -m bench.branches --branches 20 --scale 0.02
+
+Seeds --branches separate databases with bench.seed and times branches.consolidated()
+cold (caches cleared) against calling branch_report() for each branch in turn, next to
+the slowest single branch.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import branches
+import db
+import finance
+import seatmap
+from bench.seed import seed
+
+def cold():
+    branches._cache.clear(); seatmap._cache.clear(); finance._cache.clear()
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--branches', type=int, default=20)
+    ap.add_argument('--scale', type=float, default=0.02, help="bench.seed volume per branch (default 0.02)")
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        found = []
+        t = time.perf_counter()
+        for i in range(args.branches):
+            path = os.path.join(tmp, f"branch{i}.db")
+            seed(path, args.scale, rng_seed=i, log=lambda *_: None)
+            found.append(branches.Branch(f"b{i}", f"Branch {i}", path))
+        print(f"seeded {args.branches} branches at scale {args.scale} in {time.perf_counter() - t:.0f} s")
+        seq, par, slowest = [], [], []
+        for _ in range(args.repeat):
+            cold(); t = time.perf_counter()
+            singles = []
+            for b in found:
+                s = time.perf_counter(); branches.branch_report(b); singles.append(time.perf_counter() - s)
+            seq.append(time.perf_counter() - t); slowest.append(max(singles))
+            cold(); t = time.perf_counter(); branches.consolidated(found); par.append(time.perf_counter() - t)
+        t = time.perf_counter(); branches.consolidated(found); warm = time.perf_counter() - t
+        print(f"  one after another : {min(seq) * 1000:8.1f} ms")
+        print(f"  slowest branch    : {min(slowest) * 1000:8.1f} ms")
+        print(f"  concurrent (cold) : {min(par) * 1000:8.1f} ms")
+        print(f"  concurrent (warm) : {warm * 1000:8.1f} ms")
+        for b in found: db.get_pool(b.path).close_all()
+
+if __name__ == '__main__':
+    main()
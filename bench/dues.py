@@ -0,0 +1,35 @@
+"""Batch dues engine over N students: first pass, steady-state pass and next-day pass.
+
+    python -m bench.dues --students 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+import db
+import dues
+import schema
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--students', type=int, default=100_000)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        schema.migrate(path); conn = db.get_db(path)
+        today = date.today()
+        conn.executemany("INSERT INTO students (name, phone, due_date, mercy_days, status, is_profile_approved) VALUES (?,?,?,?,?,1)",
+                         ((f"S{i}", str(9000000000 + i), today + timedelta(days=random.randint(-60, 45)), random.choice((0, 0, 0, 3)),
+                           random.choice(('Active',) * 8 + ('Alumni', 'Locked'))) for i in range(args.students)))
+        conn.execute("UPDATE students SET dues_state = 'ok'"); conn.commit()  # force every row through the engine
+        for label, day in (("first pass", today), ("steady state", today), ("next day", today + timedelta(days=1))):
+            t = time.perf_counter(); report = dues.run(conn, day)
+            print(f"{label:>12}: {(time.perf_counter() - t) * 1000:7.1f} ms  changed={report['changed']:,} notified={report['notified']:,}  "
+                  + " ".join(f"{k}={report.get(k, 0):,}" for k in ('ok', 'expiring', 'grace', 'suspended', 'locked')))
+        conn.close(); db.get_pool(path).close_all()
+
+if __name__ == '__main__':
+    main()
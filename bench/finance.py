@@ -0,0 +1,56 @@
+"""Finance tab load time vs ledger size: legacy full-ledger sums vs rollup dashboard.
+
+    python -m bench.finance --rows 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+import db
+import finance
+import schema
+
+def fill(conn, n, start=0):
+    today = date.today()
+    day = lambda i: str(today - timedelta(days=i % 730))
+    half = n // 2
+    # Bulk-load with the rollup triggers in place: this is the write path the app uses.
+    conn.executemany("INSERT INTO income (source, amount, date, remarks) VALUES (?,?,?,?)",
+                     ((random.choice(("Fee: S", "Join: S", "Misc")), 800, day(i), 'Fee') for i in range(start, start + half)))
+    conn.executemany("INSERT INTO expenses (category, amount, date) VALUES (?,?,?)",
+                     ((random.choice(("Rent", "Elec", "Staff")), random.randint(100, 5000), day(i)) for i in range(start, start + n - half)))
+    conn.commit()
+
+def legacy(conn):
+    conn.execute("SELECT sum(amount) FROM income").fetchone(); conn.execute("SELECT sum(amount) FROM expenses").fetchone()
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t)
+    return best * 1000
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--rows', type=int, default=1_000_000, help="largest ledger size (income + expenses)")
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        schema.migrate(path); conn = db.get_db(path)
+        loaded = 0
+        for size in (10_000, 100_000, args.rows):
+            if size > args.rows: continue
+            t = time.perf_counter(); fill(conn, size - loaded, loaded); ins = (time.perf_counter() - t) / (size - loaded) * 1e6; loaded = size
+            finance._cache.clear()
+            cold = timed(lambda: (finance._cache.clear(), finance.dashboard(conn)), 1)
+            print(f"{size:>9,} rows | legacy sums {timed(lambda: legacy(conn)):7.2f} ms | rollup reads {timed(lambda: finance.summary(conn)):5.2f} ms | "
+                  f"dashboard cold {cold:6.2f} ms, cached {timed(lambda: finance.dashboard(conn)):5.3f} ms | insert+rollup {ins:4.1f} µs/row")
+        t = time.perf_counter(); finance.rebuild(conn)
+        print(f"rebuild from {loaded:,} ledger rows: {(time.perf_counter() - t) * 1000:.0f} ms")
+        conn.close(); db.get_pool(path).close_all()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Latency and memory of every dashboard data path, with a regression gate.
+
+    python -m bench.seed data/scratch.db
+    python -m bench.harness data/scratch.db --save      # record bench/baseline.json
+    python -m bench.harness data/scratch.db             # compare; exits 1 on a regression
+
+Each path runs what one page render reads, minus Streamlit. Latency is the p50/p95
+over --runs timed calls after a warm-up; peak memory is the tracemalloc high-water mark
+of one separate call (tracing slows the code down, so it is never timed). A path fails
+when its p95 exceeds the baseline by more than --tolerance plus --floor-ms, or its peak
+memory by more than --tolerance plus 256 KiB. Without a database argument it seeds a
+temporary one at --scale.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+import allocator
+import db
+import finance
+import queries
+import roster
+import schema
+import seatmap
+import students
+import study
+from bench.seed import seed
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+MEMORY_FLOOR_KIB = 256
+
+def _sample(conn, sql, n=200, rng=None):
+    ids = [r[0] for r in conn.execute(sql)]
+    return (rng or random).sample(ids, min(n, len(ids))) or [0]
+
+def paths(conn, rng):
+    """name -> zero-argument callable doing one page's reads. Students are drawn at random per call."""
+    active = _sample(conn, "SELECT student_id FROM students WHERE status='Active' AND assigned_seat_id IS NOT NULL", rng=rng)
+    phones = [r[0] for r in conn.execute(f"SELECT phone FROM students WHERE student_id IN ({','.join(map(str, active))})")] or ['']
+    names = [r[0].split()[0] for r in conn.execute("SELECT name FROM students ORDER BY random() LIMIT 50") if r[0]] or ['a']
+    pick = lambda seq: seq[rng.randrange(len(seq))]
+    today = date.today()
+
+    def roster_walk(filter_opt, search=''):
+        def run():
+            rows, cursor = roster.page(conn, filter_opt, search, today=today)
+            if cursor: roster.page(conn, filter_opt, search, after=cursor, today=today)
+        return run
+
+    def finance_page():
+        board = finance.summary(conn)
+        finance.trend_charts(board['frame'])
+
+    def approvals():
+        queries.pending_students(conn); queries.seatless_students(conn); queries.available_seat_labels(conn)
+        allocator.free_seats(conn)
+
+    def student_hub():
+        user = students.load(conn, pick(active))
+        students.refresh(conn, user)
+        queries.latest_notice(conn); queries.recent_notifications(conn, user.student_id)
+
+    def complaints():
+        queries.open_tickets(conn); queries.ticket_history(conn, pick(active))
+
+    def login():
+        students.login(conn, pick(phones), 'pw'); queries.admin_login(conn, 'admin', 'admin123')
+
+    def focus():
+        sid = pick(active)
+        board = study.summary(conn, sid); study.heatmap_chart(board['frame'])
+        study.leaderboard(conn); study.weekly_leaderboard(conn); study.xp_rank(conn, rng.randrange(50_000))
+
+    return {
+        'map': lambda: seatmap.build_snapshot(conn, today),
+        'master_list_all': roster_walk('All'),
+        'master_list_active': roster_walk('Active'),
+        'master_list_defaulters': roster_walk('Defaulters'),
+        'master_list_search': lambda: roster_walk('All', pick(names))(),
+        'finance': finance_page,
+        'approvals': approvals,
+        'student_hub': student_hub,
+        'complaints': complaints,
+        'login': login,
+        'focus': focus,
+    }
+
+def measure(fn, runs, warmup=3):
+    for _ in range(warmup): fn()
+    times = []
+    for _ in range(runs):
+        t = time.perf_counter(); fn(); times.append((time.perf_counter() - t) * 1000)
+    tracemalloc.start()
+    try:
+        fn(); peak = tracemalloc.get_traced_memory()[1]
+    finally: tracemalloc.stop()
+    times.sort()
+    return {'p50_ms': round(statistics.median(times), 3), 'p95_ms': round(times[min(len(times) - 1, int(len(times) * 0.95))], 3),
+            'peak_kib': round(peak / 1024, 1)}
+
+def regressions(results, baseline, tolerance, floor_ms):
+    failed = []
+    for name, now in results.items():
+        base = baseline.get(name)
+        if base is None: continue
+        if now['p95_ms'] > base['p95_ms'] * (1 + tolerance) + floor_ms:
+            failed.append(f"{name}: p95 {now['p95_ms']:.2f} ms vs baseline {base['p95_ms']:.2f} ms")
+        if now['peak_kib'] > base['peak_kib'] * (1 + tolerance) + MEMORY_FLOOR_KIB:
+            failed.append(f"{name}: peak {now['peak_kib']:,.0f} KiB vs baseline {base['peak_kib']:,.0f} KiB")
+    return failed
+
+def run(path, runs=50, only=None, rng_seed=1):
+    schema.migrate(path)
+    conn = db.get_db(path)
+    try:
+        table = paths(conn, random.Random(rng_seed))
+        return {name: measure(fn, runs) for name, fn in table.items() if not only or name in only}
+    finally: conn.close()
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('db', nargs='?', help="seeded database (see bench.seed); default: seed a temporary one")
+    ap.add_argument('--scale', type=float, default=0.1, help="volume when seeding a temporary database (default 0.1)")
+    ap.add_argument('--runs', type=int, default=50)
+    ap.add_argument('--only', nargs='+', metavar='PATH', help="measure only these paths")
+    ap.add_argument('--baseline', default=BASELINE, help=f"baseline JSON (default {os.path.relpath(BASELINE)})")
+    ap.add_argument('--save', action='store_true', help="write the results as the new baseline instead of comparing")
+    ap.add_argument('--tolerance', type=float, default=0.25, help="allowed relative slowdown (default 0.25)")
+    ap.add_argument('--floor-ms', type=float, default=1.0, help="absolute slack added to every p95 limit (default 1 ms)")
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db
+        if path is None:
+            path = os.path.join(tmp, 'bench.db')
+            seed(path, args.scale, log=lambda *_: None)
+        conn = db.get_db(path)
+        counts = {t: conn.execute(f"SELECT count(*) FROM {t}").fetchone()[0] for t in ('students', 'seats', 'study_logs', 'income')}
+        conn.close()
+        print(f"{path}: " + ", ".join(f"{k}={v:,}" for k, v in counts.items()))
+        results = run(path, args.runs, args.only)
+        db.get_pool(path).close_all()
+    print(f"{'path':<24}{'p50 ms':>10}{'p95 ms':>10}{'peak KiB':>12}")
+    for name, r in results.items(): print(f"{name:<24}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['peak_kib']:>12,.0f}")
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'recorded': str(date.today()), 'machine': platform.platform(), 'rows': counts, 'paths': results}, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save to record one"); return
+    with open(args.baseline) as f: baseline = json.load(f)
+    if baseline.get('rows') != counts: print(f"warning: baseline was recorded on different volumes {baseline.get('rows')}")
+    failed = regressions(results, baseline['paths'], args.tolerance, args.floor_ms)
+    for line in failed: print(f"REGRESSION {line}")
+    if failed: sys.exit(1)
+    print(f"all {len(results)} paths within {args.tolerance:.0%} of the baseline")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Queries per interaction on the admin and student dashboards.
+
+    python -m bench.reruns --scale 0.01
+
+Seeds a scratch branch with bench.seed, drives app.py through Streamlit's AppTest with
+the profiler on, and counts the statements each click or page load sends to SQLite
+(page code only; the dues and outbox workers are left out). AppTest always reruns the
+whole script, so for a click inside an st.fragment the "fragment" column is what the
+fragment's own span ran, which is all a real fragment rerun executes.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+
+from streamlit.testing.v1 import AppTest
+
+import db
+import profiler
+from bench.seed import seed
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+def page_queries(fragment=None):
+    """(page statements, statements in sections named `fragment`, count by innermost section).
+    Page code always runs inside a profiler span; the background workers never do."""
+    page = [q for q in profiler.queries if q['section']]
+    inside = [q for q in page if f"/{fragment}/" in f"/{q['section']}/"] if fragment else None
+    return len(page), None if inside is None else len(inside), Counter(q['section'].rsplit('/', 1)[-1] for q in page)
+
+def step(results, name, action, fragment=None):
+    profiler.clear(); t = time.perf_counter()
+    at = action()
+    ms = (time.perf_counter() - t) * 1000
+    if at.exception: raise SystemExit(f"{name}: {at.exception[0].value}")
+    total, inside, by = page_queries(fragment)
+    results.append((name, total, inside, ms, by))
+    return at
+
+def login(role, user, password):
+    at = AppTest.from_file(APP, default_timeout=120).run()
+    at.sidebar.radio[0].set_value("🔐 Login").run()
+    [s for s in at.selectbox if s.label == "Role"][0].set_value(role).run()
+    at.text_input[0].set_value(user); at.text_input[1].set_value(password)
+    return at.button[0].click()
+
+def button(at, label=None, prefix=None):
+    for b in at.button:
+        if (label and b.label == label) or (prefix and b.key and b.key.startswith(prefix)): return b
+    raise SystemExit(f"no button {label or prefix!r}")
+
+def open_tab(at, key, label):
+    # Lazy tabs keep the selected label in session state under their key. AppTest does not
+    # send that state back with later clicks, so steps inside a tab call this again first.
+    at.session_state[key] = label
+    return at
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--scale', type=float, default=0.01, help="bench.seed volume (default 0.01: 1k students, 40 seats)")
+    args = ap.parse_args()
+    home = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp); os.makedirs('data')
+        path = os.path.join(tmp, 'data', 'bench.db')
+        seed(path, args.scale, log=lambda *_: None)
+        with open('data/branches.json', 'w') as f: json.dump({'branches': [{'code': 'bench', 'name': 'Bench', 'path': path}]}, f)
+        conn = db.get_db(path)
+        phone, password = conn.execute("SELECT phone, password FROM students WHERE status='Active' AND dues_state='ok' AND assigned_seat_id IS NOT NULL LIMIT 1").fetchone()
+        conn.close()
+        profiler.configure(on=True, slow_log='')
+        results = []
+        try:
+            at = step(results, "admin: login + first page", lambda: login("Admin", "admin", "admin123").run())
+            at = step(results, "admin: plain rerun", lambda: at.run())
+            at = step(results, "admin: open seat dossier", lambda: button(at, prefix='m_').click().run(), 'map')
+            at = step(results, "admin: close dossier", lambda: button(at, "Close").click().run())
+            at = step(results, "admin: Database tab", lambda: open_tab(at, 'admin_tab', "👥 Database").run())
+            at = step(results, "admin: next page", lambda: button(open_tab(at, 'admin_tab', "👥 Database"), "Next ➡️").click().run(), 'database')
+            at = step(results, "admin: Complaints tab", lambda: open_tab(at, 'admin_tab', "🎫 Complaints").run())
+            at = step(results, "admin: resolve ticket", lambda: button(open_tab(at, 'admin_tab', "🎫 Complaints"), prefix='res_').click().run(), 'complaints')
+            at = step(results, "student: login + first page", lambda: login("Student", phone, password).run())
+            at = step(results, "student: Focus OS tab", lambda: open_tab(at, 'student_tab', "⏱️ Focus OS").run())
+            at = step(results, "student: start session", lambda: button(open_tab(at, 'student_tab', "⏱️ Focus OS"), "▶️ START SESSION").click().run(), 'focus_timer')
+            at = step(results, "student: stop & save", lambda: button(open_tab(at, 'student_tab', "⏱️ Focus OS"), "⏹️ STOP & SAVE XP").click().run(), 'focus_timer')
+        finally:
+            os.chdir(home); db.get_pool(path).close_all()
+    print(f"{'interaction':<30} {'queries':>8} {'fragment':>9} {'ms':>8}   by section")
+    for name, total, inside, ms, by in results:
+        print(f"{name:<30} {total:>8} {'' if inside is None else inside:>9} {ms:>8.0f}   " + ", ".join(f"{k} {v}" for k, v in by.most_common()))
+
+if __name__ == '__main__':
+    main()
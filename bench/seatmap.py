@@ -0,0 +1,73 @@
+"""Python time to prepare the Live Floor Plan, legacy iterrows/strptime vs seat snapshot.
+
+    python -m bench.seatmap --seats 2000 --floors 4
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import db
+import schema
+import seatmap
+
+def build(path, seats, floors):
+    schema.migrate(path)
+    conn = db.get_db(path)
+    conn.execute("DELETE FROM seats")
+    per_floor = seats // floors
+    for f in range(1, floors + 1): seatmap.add_floor(conn, f, per_floor // 25, 25, chr(ord('A') + f - 1))
+    ids = [r[0] for r in conn.execute("SELECT seat_id FROM seats")]
+    today = date.today()
+    conn.executemany("INSERT INTO students (name, phone, due_date, status, is_profile_approved, is_seat_approved, assigned_seat_id) VALUES (?,?,?,'Active',1,1,?)",
+                     [(f"S{i}", str(9000000000 + i), today + timedelta(days=random.randint(-15, 40)), sid) for i, sid in enumerate(ids) if random.random() < 0.9])
+    conn.commit()
+    return conn
+
+def legacy(conn):
+    seats = pd.read_sql("SELECT * FROM seats", conn)
+    students = pd.read_sql("SELECT student_id, assigned_seat_id, due_date FROM students WHERE assigned_seat_id IS NOT NULL", conn)
+    seat_data = {row['assigned_seat_id']: row for _, row in students.iterrows()}
+    labels = []
+    for r in range(0, len(seats), 10):
+        for i in range(10):
+            if r + i < len(seats):
+                s = seats.iloc[r + i]; label = s['seat_label']
+                if s['seat_id'] in seat_data:
+                    days = (datetime.strptime(str(seat_data[s['seat_id']]['due_date']), '%Y-%m-%d').date() - date.today()).days
+                    label = f"{'🔴' if days < 0 else '🟠' if days < 7 else '🔵'} {label}"
+                labels.append(label)
+    return labels
+
+def render(snap):
+    # What the Map tab does per cell apart from the st.button call itself
+    return [f"{seatmap.BADGES.get(cell[2], '')} {cell[1]}" for rows in snap['floors'].values() for row in rows for cell in row if cell]
+
+def timed(fn, n):
+    best = float('inf')
+    for _ in range(n):
+        t = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t)
+    return best * 1000
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--seats', type=int, default=2000)
+    ap.add_argument('--floors', type=int, default=4)
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = build(os.path.join(tmp, 'bench.db'), args.seats, args.floors)
+        n = conn.execute("SELECT count(*) FROM seats").fetchone()[0]
+        print(f"{n} seats on {args.floors} floors")
+        print(f"  legacy iterrows + strptime : {timed(lambda: legacy(conn), args.repeat):8.2f} ms")
+        print(f"  snapshot, cold (1 query)   : {timed(lambda: render(seatmap.build_snapshot(conn)), args.repeat):8.2f} ms")
+        seatmap.snapshot(conn)
+        print(f"  snapshot, cached           : {timed(lambda: render(seatmap.snapshot(conn)), args.repeat):8.2f} ms")
+        conn.close(); db.get_pool(conn.path).close_all()
+
+if __name__ == '__main__':
+    main()
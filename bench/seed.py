@@ -0,0 +1,137 @@
+"""Fill a scratch database with production-sized synthetic data.
+
+    python -m bench.seed data/scratch.db                # 100k students, 4k seats, 10M study logs, 1M+1M ledger rows
+    python -m bench.seed data/scratch.db --scale 0.05   # same shape, 5% of the volume
+
+The schema comes from schema.migrate(), so it is exactly what the app runs on. Triggers
+and secondary indexes on the bulk tables are dropped while loading and put back
+afterwards; the trigger-maintained state (search index, finance/study rollups, dues
+state, seatmap version) is then rebuilt in one pass each. Full size takes a few minutes
+and about 1 GB of disk.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+
+import db
+import dues
+import finance
+import schema
+import seatmap
+import study
+
+VOLUMES = {'students': 100_000, 'seats': 4_000, 'study_logs': 10_000_000, 'income': 1_000_000, 'expenses': 1_000_000,
+           'complaints': 50_000}
+FLOOR_ROWS, FLOOR_COLS = 20, 25
+BULK_TABLES = ('seats', 'students', 'study_logs', 'income', 'expenses', 'complaints')
+CHUNK = 1_000_000
+EXAMS = ('UPSC', 'NEET', 'JEE', 'SSC', 'CA', 'Banking')
+FIRST = ('Aarav', 'Vivaan', 'Aditya', 'Ishaan', 'Kabir', 'Ananya', 'Diya', 'Saanvi', 'Meera', 'Riya', 'Rohan', 'Neha', 'Arjun', 'Pooja', 'Kiran')
+LAST = ('Sharma', 'Verma', 'Gupta', 'Singh', 'Yadav', 'Patel', 'Khan', 'Mishra', 'Jain', 'Reddy', 'Das', 'Nair')
+EXPENSES = ('Electricity', 'Rent', 'Internet', 'Salary', 'Maintenance', 'Cleaning', 'Water')
+
+# Row generators that run inside SQLite: a counter CTE feeding INSERT ... SELECT with random().
+_COUNTER = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :rows) "
+_DAYS_AGO = "date(:today, '-' || (abs(random()) % :days) || ' days')"
+BULK_SQL = {
+    'study_logs': _COUNTER + f"""INSERT INTO study_logs (student_id, date, duration_minutes, session_type)
+        SELECT abs(random()) % :students + 1, {_DAYS_AGO}, 10 + abs(random()) % 170,
+               CASE abs(random()) % 5 WHEN 0 THEN 'Revision' ELSE 'Study' END FROM n""",
+    'income': _COUNTER + f"""INSERT INTO income (source, amount, date, remarks)
+        SELECT CASE abs(random()) % 20 WHEN 0 THEN 'Join' WHEN 1 THEN 'Guest' WHEN 2 THEN 'Locker' ELSE 'Fee' END || ': S' || (abs(random()) % :students + 1),
+               (1 + abs(random()) % 4) * 400, {_DAYS_AGO}, 'Cash' FROM n""",
+    'expenses': _COUNTER + f"""INSERT INTO expenses (category, amount, date)
+        SELECT json_extract(:categories, '$[' || (abs(random()) % :n_categories) || ']'), 100 + abs(random()) % 5000, {_DAYS_AGO} FROM n""",
+    'complaints': _COUNTER + f"""INSERT INTO complaints (student_id, category, priority, message, status, date)
+        SELECT abs(random()) % :students + 1, 'Facility', CASE abs(random()) % 3 WHEN 0 THEN 'High' ELSE 'Normal' END,
+               'AC not working near my seat', CASE WHEN abs(random()) % 10 = 0 THEN 'Open' ELSE 'Resolved' END, {_DAYS_AGO} FROM n""",
+}
+
+def _students(n, seat_ids, today, rnd):
+    """(name, phone, password, exam, father_name, joining_date, due_date, profile, seat_ok, seat, status, xp, wants_locker)"""
+    seats = iter(seat_ids)
+    for i in range(n):
+        roll = rnd.random()
+        name = f"{rnd.choice(FIRST)} {rnd.choice(LAST)}"
+        joined = today - timedelta(days=rnd.randrange(30, 1000))
+        if roll < 0.03:      # waiting for approval
+            row = (None, 0, 0, None, 'Pending')
+        elif roll < 0.13:    # left
+            row = (today - timedelta(days=rnd.randrange(30, 700)), 1, 0, None, 'Alumni')
+        elif roll < 0.14:    # locked by an admin
+            row = (today - timedelta(days=rnd.randrange(10, 60)), 1, 0, None, 'Locked')
+        else:                # paying members; most hold a seat until the seats run out
+            seat = next(seats, None) if roll < 0.99 else None
+            row = (today + timedelta(days=rnd.randrange(-20, 45)), 1, int(seat is not None), seat, 'Active')
+        due, profile, seat_ok, seat, status = row
+        yield (name, str(9_000_000_000 + i), 'pw', rnd.choice(EXAMS), f"{rnd.choice(FIRST)} {rnd.choice(LAST)}", joined, due,
+               profile, seat_ok, seat, status, rnd.randrange(0, 50_000), int(rnd.random() < 0.2))
+
+def _drop(conn, tables):
+    """Drop triggers and secondary indexes on `tables`; returns the SQL to put them back."""
+    marks = ",".join("?" * len(tables))
+    saved = conn.execute(f"SELECT type, name, sql FROM sqlite_master WHERE type IN ('trigger', 'index') AND sql IS NOT NULL "
+                         f"AND tbl_name IN ({marks}) ORDER BY type = 'trigger'", tables).fetchall()
+    for kind, name, _ in saved: conn.execute(f"DROP {kind.upper()} {name}")
+    return [sql for _, _, sql in saved]
+
+def seed(path, scale=1.0, today=None, rng_seed=7, log=print):
+    """Create a fresh database at `path` and fill it. Returns {table: rows}."""
+    if os.path.abspath(path) == os.path.abspath(db.DB_NAME): raise ValueError(f"refusing to seed the live database {db.DB_NAME}")
+    if os.path.exists(path): raise FileExistsError(f"{path} already exists; seed a new file")
+    today, rnd = today or date.today(), random.Random(rng_seed)
+    n = {k: max(1, int(v * scale)) for k, v in VOLUMES.items()}
+    schema.migrate(path)
+    conn = db.get_db(path)
+    try:
+        conn.execute("PRAGMA synchronous=OFF")
+        restore = _drop(conn, BULK_TABLES)
+        t = time.perf_counter()
+        conn.execute("DELETE FROM seats")
+        per_floor = FLOOR_ROWS * FLOOR_COLS
+        for floor in range(1, -(-n['seats'] // per_floor) + 1):
+            rows = min(FLOOR_ROWS, -(-(n['seats'] - (floor - 1) * per_floor) // FLOOR_COLS))
+            seatmap.add_floor(conn, floor, rows, FLOOR_COLS, chr(ord('A') + floor - 1))
+        seat_ids = [r[0] for r in conn.execute("SELECT seat_id FROM seats ORDER BY seat_id")]
+        rnd.shuffle(seat_ids)
+        conn.executemany("""INSERT INTO students (name, phone, password, exam, father_name, joining_date, due_date, is_profile_approved,
+            is_seat_approved, assigned_seat_id, status, xp_points, wants_locker) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+                         _students(n['students'], seat_ids[:int(len(seat_ids) * 0.9)], today, rnd))
+        conn.execute("UPDATE seats SET status='Occupied' WHERE seat_id IN (SELECT assigned_seat_id FROM students WHERE assigned_seat_id IS NOT NULL)")
+        conn.commit()
+        log(f"  seats + students       {time.perf_counter() - t:6.1f} s")
+        params = {'today': str(today), 'students': n['students'], 'categories': '["' + '","'.join(EXPENSES) + '"]', 'n_categories': len(EXPENSES)}
+        for table in ('study_logs', 'income', 'expenses', 'complaints'):
+            t = time.perf_counter()
+            days = 365 if table == 'study_logs' else 3 * 365
+            for start in range(0, n[table], CHUNK):
+                conn.execute(BULK_SQL[table], {**params, 'rows': min(CHUNK, n[table] - start), 'days': days}); conn.commit()
+            log(f"  {table:<22} {time.perf_counter() - t:6.1f} s")
+        t = time.perf_counter()
+        conn.execute("INSERT INTO notices (message, type, date) VALUES ('Library closed on Sunday for maintenance', 'Info', ?)", (today,))
+        for sql in restore: conn.execute(sql)
+        conn.execute("INSERT INTO students_fts (students_fts) VALUES ('rebuild')")
+        conn.execute(f"UPDATE students SET dues_state = {schema.DUES_STATE_SQL.format(today=':today')}", {'today': str(today)})
+        conn.execute("UPDATE data_versions SET version = version + 1")
+        conn.commit()
+        finance.rebuild(conn); study.rebuild(conn); dues.run(conn, today)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # no ANALYZE: the live database has no planner stats either
+        log(f"  indexes + rollups      {time.perf_counter() - t:6.1f} s")
+        return {table: conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in BULK_TABLES + ('notifications',)}
+    finally: conn.close()
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('path', help="new database file to create")
+    ap.add_argument('--scale', type=float, default=1.0, help="fraction of the full volumes (default 1.0)")
+    ap.add_argument('--seed', type=int, default=7, help="random seed for the student roster")
+    args = ap.parse_args()
+    t = time.perf_counter()
+    counts = seed(args.path, args.scale, rng_seed=args.seed)
+    print(f"seeded {args.path} in {time.perf_counter() - t:.0f} s: " + ", ".join(f"{k}={v:,}" for k, v in counts.items()))
+    db.get_pool(args.path).close_all()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Reruns/sec with N concurrent Streamlit-like sessions, legacy vs pooled connections.
+
+    python -m bench.sessions --sessions 50 --seconds 10
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import db
+
+SCHEMA = [
+    "CREATE TABLE seats (seat_id INTEGER PRIMARY KEY AUTOINCREMENT, seat_label TEXT UNIQUE, has_locker INTEGER, status TEXT DEFAULT 'Available')",
+    "CREATE TABLE students (student_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, phone TEXT UNIQUE, due_date DATE, is_profile_approved INTEGER, is_seat_approved INTEGER, assigned_seat_id INTEGER, mercy_days INTEGER DEFAULT 0, status TEXT, xp_points INTEGER DEFAULT 0)",
+    "CREATE TABLE income (id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT, amount INTEGER, date DATE)",
+    "CREATE TABLE expenses (id INTEGER PRIMARY KEY AUTOINCREMENT, category TEXT, amount INTEGER, date DATE)",
+    "CREATE TABLE notices (id INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT)",
+    "CREATE TABLE notifications (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, message TEXT, date DATE)",
+    "CREATE TABLE complaints (ticket_id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, status TEXT)",
+    "CREATE TABLE study_logs (log_id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, date DATE, duration_minutes INTEGER)",
+]
+
+def build(path, students=500):
+    conn = sqlite3.connect(path)
+    for ddl in SCHEMA: conn.execute(ddl)
+    conn.executemany("INSERT INTO seats (seat_label, has_locker) VALUES (?,?)", [(f"A-{i}", i % 5 == 0) for i in range(1, 101)])
+    today = date.today()
+    conn.executemany("INSERT INTO students (name, phone, due_date, is_profile_approved, is_seat_approved, assigned_seat_id, status) VALUES (?,?,?,?,?,?,?)",
+                     [(f"S{i}", str(9000000000 + i), today + timedelta(days=random.randint(-10, 40)), 1, 1, i if i <= 100 else None, 'Active') for i in range(1, students + 1)])
+    conn.executemany("INSERT INTO income (source, amount, date) VALUES ('Fee', 800, ?)", [(today,)] * 2000)
+    conn.commit(); conn.close()
+
+def legacy_connect(path):
+    return lambda: sqlite3.connect(path, check_same_thread=False)
+
+def pooled_connect(path):
+    return lambda: db.get_db(path)
+
+# One "rerun" mirrors the queries app.py issues: a student page (lockout check, notice,
+# dedupe-notify, alerts, ticket history, sometimes a focus session) or an admin page.
+def student_rerun(connect, sid, shared_xp=True):
+    c = connect(); c.execute("SELECT status, due_date, mercy_days FROM students WHERE student_id=?", (sid,)).fetchone(); c.close()
+    c = connect()
+    if not c.execute("SELECT 1 FROM notifications WHERE student_id=? AND message=? AND date=?", (sid, "expiring", date.today())).fetchone():
+        c.execute("INSERT INTO notifications (student_id, message, date) VALUES (?,?,?)", (sid, "expiring", date.today())); c.commit()
+    c.close()
+    c = connect()
+    c.execute("SELECT * FROM notices ORDER BY id DESC LIMIT 1").fetchall()
+    c.execute("SELECT * FROM notifications WHERE student_id=? ORDER BY id DESC LIMIT 3", (sid,)).fetchall()
+    c.execute("SELECT * FROM complaints WHERE student_id=? ORDER BY ticket_id DESC", (sid,)).fetchall()
+    if random.random() < 0.2:
+        c.execute("INSERT INTO study_logs (student_id, date, duration_minutes) VALUES (?,?,?)", (sid, date.today(), 25))
+        # Legacy update_xp() opened a second connection while this one held the write lock.
+        x = c if shared_xp else connect()
+        x.execute("UPDATE students SET xp_points = xp_points + 25 WHERE student_id=?", (sid,))
+        if x is not c: x.commit(); x.close()
+        c.commit()
+    c.close()
+
+def admin_rerun(connect, sid):
+    c = connect()
+    c.execute("SELECT * FROM students WHERE student_id=?", (sid,)).fetchall()
+    c.execute("SELECT * FROM seats").fetchall()
+    c.execute("SELECT student_id, assigned_seat_id, due_date FROM students WHERE assigned_seat_id IS NOT NULL").fetchall()
+    c.execute("SELECT * FROM students WHERE status != 'Pending'").fetchall()
+    c.execute("SELECT sum(amount) FROM income").fetchone(); c.execute("SELECT sum(amount) FROM expenses").fetchone()
+    c.execute("SELECT * FROM complaints WHERE status='Open' ORDER BY ticket_id DESC").fetchall()
+    c.close()
+
+def run(mode, path, sessions, seconds, students):
+    connect = (legacy_connect if mode == 'legacy' else pooled_connect)(path)
+    done, errors, stop = [0] * sessions, [0] * sessions, time.perf_counter() + seconds
+
+    def session(n):
+        rnd = random.Random(n)
+        while time.perf_counter() < stop:
+            sid = rnd.randint(1, students)
+            try:
+                if n % 10 == 0: admin_rerun(connect, sid)
+                else: student_rerun(connect, sid, shared_xp=mode != 'legacy')
+                done[n] += 1
+            except sqlite3.OperationalError: errors[n] += 1
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return sum(done) / seconds, sum(errors)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--sessions', type=int, default=50)
+    ap.add_argument('--seconds', type=float, default=10)
+    ap.add_argument('--students', type=int, default=500)
+    args = ap.parse_args()
+    for mode in ('legacy', 'pooled'):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            build(path, args.students)
+            rps, errs = run(mode, path, args.sessions, args.seconds, args.students)
+            db.get_pool(path).close_all()
+            print(f"{mode:>7}: {rps:8.1f} reruns/s  ({errs} 'database is locked' errors, {args.sessions} sessions)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Study analytics latency over a large study_logs table.
+
+    python -m bench.study --logs 10000000 --students 100000
+
+Loading goes through the study_daily triggers (~40 s per million rows); the timed
+queries never touch study_logs except the one labelled as the raw-log baseline.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+import db
+import schema
+import study
+
+def fill(conn, logs, students, days=365):
+    today = date.today()
+    dates = [str(today - timedelta(days=i)) for i in range(days)]
+    conn.executemany("INSERT INTO students (name, phone, exam, status, xp_points) VALUES (?,?,?,'Active',?)",
+                     ((f"S{i}", str(9000000000 + i), random.choice(("UPSC", "NEET")), random.randint(0, 50_000)) for i in range(students)))
+    rnd = random.Random(7)
+    # Load through the same trigger that maintains study_daily in the app, in 1M-row batches.
+    for start in range(0, logs, 1_000_000):
+        conn.executemany("INSERT INTO study_logs (student_id, date, duration_minutes, session_type) VALUES (?,?,?,'Study')",
+                         ((rnd.randint(1, students), dates[rnd.randrange(days)], rnd.randint(10, 180)) for _ in range(start, min(logs, start + 1_000_000))))
+        conn.commit()
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t)
+    return best * 1000
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--logs', type=int, default=10_000_000)
+    ap.add_argument('--students', type=int, default=100_000)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        schema.migrate(path); conn = db.get_db(path)
+        t = time.perf_counter(); fill(conn, args.logs, args.students)
+        print(f"loaded {args.logs:,} study_logs for {args.students:,} students in {time.perf_counter() - t:.0f} s "
+              f"({conn.execute('SELECT count(*) FROM study_daily').fetchone()[0]:,} study_daily rows)")
+        sid = lambda: random.randint(1, args.students)
+        since = str(date.today() - timedelta(days=6))
+        print(f"  XP leaderboard (top 10)          : {timed(lambda: study.leaderboard(conn)):8.2f} ms")
+        print(f"  XP rank of one student           : {timed(lambda: study.xp_rank(conn, 25_000)):8.2f} ms")
+        print(f"  weekly leaderboard (study_daily) : {timed(lambda: study.weekly_leaderboard(conn)):8.2f} ms")
+        print(f"  weekly leaderboard (study_logs)  : {timed(lambda: conn.execute('SELECT student_id, sum(duration_minutes) FROM study_logs WHERE date >= ? GROUP BY student_id ORDER BY 2 DESC LIMIT 10', (since,)).fetchall(), 1):8.2f} ms")
+        print(f"  student summary + streaks        : {timed(lambda: study.summary(conn, sid())):8.2f} ms")
+        print(f"  heatmap chart                    : {timed(lambda: study.heatmap_chart(study.daily(conn, sid(), date.today() - timedelta(days=83)))):8.2f} ms")
+        conn.close(); db.get_pool(path).close_all()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pandas as pd
+
+import finance
+import schema
+import seatmap
+from db import DB_NAME, data_version, get_db
+
+# ==========================================
+# BRANCHES & CROSS-BRANCH REPORTS
+# ==========================================
+# Each branch is its own SQLite file (seats, students, ledgers, outbox), so one branch's
+# writes never wait on another's lock. data/branches.json lists them; without it there is
+# one branch, 'main', on DB_NAME. Consolidated reports run the per-branch reads on a
+# thread pool (sqlite3 releases the GIL while a query steps), so they take about as long
+# as the slowest branch; ATTACH would cap out at 10 files and serialise on one connection.
+REGISTRY = 'data/branches.json'
+REPORT_TTL = 60                 # seconds a branch's dues counts may be stale in the report
+MAX_THREADS = 32
+
+Branch = namedtuple('Branch', 'code name path')
+DEFAULT = Branch('main', 'Main Branch', DB_NAME)
+
+_lock = threading.Lock()
+_registry = (None, None)        # (registry mtime, [Branch])
+
+def registered():
+    """Branches in registry order; re-read only when the file changes."""
+    global _registry
+    try: mtime = os.path.getmtime(REGISTRY)
+    except OSError: return [DEFAULT]
+    if _registry[0] != mtime:
+        with open(REGISTRY) as f: data = json.load(f)
+        _registry = (mtime, [Branch(b['code'], b['name'], b['path']) for b in data['branches']] or [DEFAULT])
+    return _registry[1]
+
+def get(code=None):
+    """Branch `code`, or the first one. Unknown codes raise KeyError."""
+    found = registered()
+    if code is None: return found[0]
+    for b in found:
+        if b.code == code: return b
+    raise KeyError(f"no branch {code!r}")
+
+def add(code, name, admin, password, path=None):
+    """Register a branch and create its database, whose only account is the branch admin
+    `admin`/`password` (role 'Admin': no cross-branch view). Returns the Branch."""
+    code, admin = code.strip().lower(), admin.strip()
+    if not re.fullmatch(r"[a-z0-9_-]{1,32}", code): raise ValueError("branch code: 1-32 letters, digits, - or _")
+    if not admin or len(password) < 8: raise ValueError("branch admin: a username and a password of at least 8 characters")
+    with _lock:
+        current = registered()
+        if any(b.code == code for b in current): raise ValueError(f"branch {code!r} already exists")
+        branch = Branch(code, name.strip() or code, path or f"data/branch_{code}.db")
+        schema.migrate(branch.path)
+        conn = get_db(branch.path)
+        try:
+            # Replace the default admin/admin123 super-admin that every new database starts with
+            conn.execute("DELETE FROM admins"); conn.execute("INSERT INTO admins VALUES (?,?,'Admin')", (admin, password)); conn.commit()
+        finally: conn.close()
+        folder = os.path.dirname(REGISTRY) or '.'
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix='.part')
+        with os.fdopen(fd, 'w') as f: json.dump({'branches': [b._asdict() for b in current + [branch]]}, f, indent=2)
+        os.replace(tmp, REGISTRY)
+    return branch
+
+# ---- federated report ----
+_pool = ThreadPoolExecutor(max_workers=MAX_THREADS, thread_name_prefix='branch-report')
+_cache = {}                     # branch path -> ((seatmap version, finance version, day, months), expires, report)
+
+# The Map's own seat classification, counted per state instead of drawn
+OCCUPANCY_SQL = f"WITH snap (seat_id, label, floor, row_no, col_no, student_id, state) AS ({seatmap.SNAPSHOT_SQL}) SELECT state, count(*) FROM snap GROUP BY state"
+
+def branch_report(branch, months=12):
+    """One branch's occupancy, dues and P&L. Cached until its seats/ledgers change or REPORT_TTL passes."""
+    conn = get_db(branch.path)
+    try:
+        t = time.perf_counter()
+        key = (data_version(conn, 'seatmap'), data_version(conn, 'finance'), date.today(), months)
+        hit = _cache.get(branch.path)
+        if hit and hit[0] == key and hit[1] > time.monotonic(): return hit[2]
+        # Aggregates only, so nearly all the work is inside SQLite with the GIL released;
+        # the DataFrames are built once, after the merge.
+        counts = dict(conn.execute(OCCUPANCY_SQL, {'today': str(key[2]), 'expiring': seatmap.EXPIRING_DAYS}).fetchall())
+        dues = dict(conn.execute("SELECT dues_state, count(*) FROM students WHERE status='Active' GROUP BY dues_state").fetchall())
+        totals = dict(conn.execute("SELECT kind, sum(amount) FROM finance_monthly GROUP BY kind").fetchall())
+        monthly = conn.execute("SELECT month, kind, sum(amount) FROM finance_monthly WHERE month >= ? GROUP BY month, kind",
+                               (finance.month_window(months - 1),)).fetchall()
+        report = {'branch': branch, 'seats': sum(counts.values()), 'seat_states': counts, 'dues': dues,
+                  'income': totals.get('income') or 0, 'expense': totals.get('expense') or 0, 'monthly': monthly,
+                  'ms': (time.perf_counter() - t) * 1000}
+        _cache[branch.path] = (key, time.monotonic() + REPORT_TTL, report)
+        return report
+    finally: conn.close()
+
+def consolidated(branches=None, months=12):
+    """Every branch's report, fetched concurrently, plus the merged tables:
+    {'branches': [report], 'occupancy', 'dues', 'pnl': DataFrames, 'monthly': month x branch frame, 'errors': {code: text}}."""
+    branches = branches or registered()
+    futures = {b.code: _pool.submit(branch_report, b, months) for b in branches}
+    reports, errors = [], {}
+    for code, fut in futures.items():
+        try: reports.append(fut.result())
+        except Exception as e: errors[code] = f"{type(e).__name__}: {e}"
+    occupancy = pd.DataFrame([{'Branch': r['branch'].name, 'Seats': r['seats'],
+                               'Occupied': r['seats'] - r['seat_states'].get('available', 0),
+                               'Expired': r['seat_states'].get('expired', 0), 'Expiring': r['seat_states'].get('expiring', 0)} for r in reports],
+                             columns=['Branch', 'Seats', 'Occupied', 'Expired', 'Expiring'])
+    occupancy['Occupancy %'] = (100 * occupancy['Occupied'] / occupancy['Seats'].where(occupancy['Seats'] > 0)).round(1)
+    dues = pd.DataFrame([{'Branch': r['branch'].name, **{s: r['dues'].get(s, 0) for s in ('ok', 'expiring', 'grace', 'suspended')}} for r in reports],
+                        columns=['Branch', 'ok', 'expiring', 'grace', 'suspended'])
+    pnl = pd.DataFrame([{'Branch': r['branch'].name, 'Income': r['income'], 'Expense': r['expense'], 'Profit': r['income'] - r['expense']}
+                        for r in reports], columns=['Branch', 'Income', 'Expense', 'Profit'])
+    monthly = pd.DataFrame([(m, r['branch'].name, k, a) for r in reports for m, k, a in r['monthly']], columns=['month', 'branch', 'kind', 'amount'])
+    return {'branches': reports, 'occupancy': occupancy, 'dues': dues, 'pnl': pnl, 'monthly': monthly, 'errors': errors}
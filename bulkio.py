@@ -0,0 +1,201 @@
+import csv
+import io
+import os
+import sqlite3
+from contextlib import nullcontext
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from db import immediate
+
+# ==========================================
+# BULK IMPORT / EXPORT
+# ==========================================
+# Imports validate every row in Python and insert the good ones with executemany, one
+# BEGIN IMMEDIATE transaction per chunk, so row triggers (search index, rollups, dues
+# state) keep everything derived in step. Exports walk a plain cursor with fetchmany and
+# write each batch as it arrives, so memory stays flat whatever the table size.
+CHUNK = 5_000           # rows per import transaction
+BATCH = 10_000          # rows per export fetch / Parquet row group
+MAX_ERRORS = 1_000      # row errors kept in a report (all are counted)
+FORMATS = ('csv', 'parquet')
+
+STUDENT_STATUSES = ('Pending', 'Active', 'Alumni', 'Locked')
+
+class RowError(ValueError):
+    pass
+
+def _text(v):
+    v = None if v is None else str(v).strip()
+    return v or None
+
+def _date(v):
+    v = _text(v)
+    if v is None: return None
+    try: return date.fromisoformat(v[:10])
+    except ValueError: raise RowError(f"bad date {v!r} (want YYYY-MM-DD)")
+
+def _int(v):
+    v = _text(v)
+    if v is None: return None
+    try: return int(float(v))
+    except ValueError: raise RowError(f"bad number {v!r}")
+
+def _amount(v):
+    v = _text(v)
+    if v is None: raise RowError("amount is required")
+    try: v = float(v)
+    except ValueError: raise RowError(f"bad amount {v!r}")
+    if v < 0: raise RowError(f"negative amount {v:g}")
+    return int(v) if v.is_integer() else v
+
+def _flag(v):
+    return 1 if _text(v) and str(v).strip().lower() in ('1', 'true', 'yes', 'y') else 0
+
+def _student(r):
+    name, phone, password = _text(r.get('name')), _text(r.get('phone')), _text(r.get('password'))
+    if not name: raise RowError("name is required")
+    if not phone: raise RowError("phone is required")
+    if not password: raise RowError("password is required")  # never defaulted: the phone is the login ID
+    status = _text(r.get('status')) or 'Pending'
+    if status not in STUDENT_STATUSES: raise RowError(f"unknown status {status!r}")
+    due = _date(r.get('due_date'))
+    if status == 'Active' and due is None: raise RowError("active students need a due_date")
+    return {'name': name, 'phone': phone, 'password': password, 'exam': _text(r.get('exam')),
+            'email': _text(r.get('email')), 'father_name': _text(r.get('father_name')), 'guardian_phone': _text(r.get('guardian_phone')),
+            'address': _text(r.get('address')), 'joining_date': _date(r.get('joining_date')) or date.today(), 'due_date': due,
+            'status': status, 'is_profile_approved': int(status != 'Pending'), 'xp_points': _int(r.get('xp_points')) or 0,
+            'wants_locker': _flag(r.get('wants_locker'))}
+
+def _income(r):
+    source = _text(r.get('source'))
+    if not source: raise RowError("source is required")
+    return {'source': source, 'amount': _amount(r.get('amount')), 'date': _date(r.get('date')) or date.today(),
+            'remarks': _text(r.get('remarks')), 'transaction_id': _text(r.get('transaction_id'))}
+
+def _expense(r):
+    category = _text(r.get('category'))
+    if not category: raise RowError("category is required")
+    return {'category': category, 'amount': _amount(r.get('amount')), 'date': _date(r.get('date')) or date.today()}
+
+# table -> (row validator, export columns). Student passwords and document paths never leave the database.
+TABLES = {
+    'students': (_student, ('student_id', 'name', 'phone', 'exam', 'email', 'father_name', 'guardian_phone', 'address',
+                            'joining_date', 'due_date', 'status', 'dues_state', 'assigned_seat_id', 'mercy_days', 'xp_points', 'wants_locker')),
+    'income': (_income, ('id', 'source', 'amount', 'date', 'remarks', 'transaction_id')),
+    'expenses': (_expense, ('id', 'category', 'amount', 'date')),
+}
+
+# ---- readers: yield (row number, dict) without loading the file ----
+def read_csv(stream):
+    text = stream if isinstance(stream, io.TextIOBase) else io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    for i, row in enumerate(csv.DictReader(text), start=2):  # line 1 is the header
+        yield i, {(k or '').strip().lower(): v for k, v in row.items()}
+
+def read_parquet(stream):
+    i = 0
+    for batch in pq.ParquetFile(stream).iter_batches(batch_size=BATCH):
+        for row in batch.to_pylist():
+            i += 1
+            yield i, {k.strip().lower(): v for k, v in row.items()}
+
+def read(stream, fmt):
+    return read_parquet(stream) if fmt == 'parquet' else read_csv(stream)
+
+def guess_format(name):
+    return 'parquet' if str(name).lower().endswith(('.parquet', '.pq')) else 'csv'
+
+# ---- import ----
+def _existing_phones(conn, phones):
+    found = set()
+    phones = list(phones)
+    for i in range(0, len(phones), 500):
+        part = phones[i:i + 500]
+        found.update(r[0] for r in conn.execute(f"SELECT phone FROM students WHERE phone IN ({','.join('?' * len(part))})", part))
+    return found
+
+def import_rows(conn, table, rows, chunk=CHUNK, dry_run=False):
+    """Validate and insert `rows` ((row number, dict) pairs) into `table`.
+    Returns {'inserted', 'failed', 'errors': [(row number, message)]}. Bad rows are skipped,
+    never half-applied; with dry_run nothing is written."""
+    validate, _ = TABLES[table]
+    report = {'inserted': 0, 'failed': 0, 'errors': []}
+    seen = set()  # phones earlier in this file
+
+    def fail(n, msg):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_ERRORS: report['errors'].append((n, msg))
+
+    def flush(batch):
+        if not batch: return
+        # The duplicate check and the insert share one write lock, so a concurrent
+        # registration cannot slip in between and fail the whole chunk.
+        with nullcontext() if dry_run else immediate(conn):
+            if table == 'students':
+                taken = _existing_phones(conn, (r['phone'] for _, r in batch))
+                for n, r in batch:
+                    if r['phone'] in taken: fail(n, f"phone {r['phone']} already registered")
+                batch = [b for b in batch if b[1]['phone'] not in taken]
+            if batch and not dry_run:
+                cols = list(batch[0][1])
+                conn.executemany(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})", [tuple(r.values()) for _, r in batch])
+        report['inserted'] += len(batch)
+
+    batch = []
+    for n, raw in rows:
+        try: row = validate(raw)
+        except RowError as e: fail(n, str(e)); continue
+        if table == 'students':
+            if row['phone'] in seen: fail(n, f"phone {row['phone']} repeated in this file"); continue
+            seen.add(row['phone'])
+        batch.append((n, row))
+        if len(batch) >= chunk: flush(batch); batch = []
+    flush(batch)
+    return report
+
+def import_file(conn, table, stream, fmt='csv', **kw):
+    return import_rows(conn, table, read(stream, fmt), **kw)
+
+def error_csv(report):
+    out = io.StringIO()
+    w = csv.writer(out); w.writerow(['row', 'error']); w.writerows(report['errors'])
+    return out.getvalue()
+
+# ---- export ----
+ARROW_TYPES = {'amount': pa.float64(), 'xp_points': pa.int64(), 'mercy_days': pa.int64(), 'wants_locker': pa.int64(),
+               'id': pa.int64(), 'student_id': pa.int64(), 'assigned_seat_id': pa.int64()}
+
+def _batches(conn, table, batch):
+    cols = TABLES[table][1]
+    # A plain sqlite3.Cursor: the profiler's cursor reads whole results up front.
+    cur = conn.cursor(sqlite3.Cursor)
+    cur.execute(f"SELECT {', '.join(cols)} FROM {table} ORDER BY rowid")
+    while True:
+        rows = cur.fetchmany(batch)
+        if not rows: return
+        yield rows
+
+def export(conn, table, out, fmt='csv', batch=BATCH):
+    """Stream `table` into `out` (a path or binary file object) as CSV or Parquet. Returns rows written."""
+    cols = TABLES[table][1]
+    total = 0
+    if fmt == 'parquet':
+        schema = pa.schema([(c, ARROW_TYPES.get(c, pa.string())) for c in cols])
+        with pq.ParquetWriter(out, schema) as w:
+            for rows in _batches(conn, table, batch):
+                data = [[None if v is None else (v if c in ARROW_TYPES else str(v)) for v in col] for c, col in zip(cols, zip(*rows))]
+                w.write_batch(pa.RecordBatch.from_arrays([pa.array(d, type=schema.field(c).type) for c, d in zip(cols, data)], schema=schema))
+                total += len(rows)
+        return total
+    own = isinstance(out, (str, os.PathLike))
+    f = open(out, 'w', newline='', encoding='utf-8') if own else io.TextIOWrapper(out, encoding='utf-8', newline='', write_through=True)
+    try:
+        w = csv.writer(f); w.writerow(cols)
+        for rows in _batches(conn, table, batch):
+            w.writerows(rows); total += len(rows)
+    finally:
+        if own: f.close()
+        else: f.flush(); f.detach()
+    return total
@@ -0,0 +1,147 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+import profiler
+
+# ==========================================
+# SQLITE ACCESS LAYER
+# ==========================================
+# Every page, helper and tool gets its connection from here. Connections are
+# long-lived and pooled per database file, so a rerun borrows an already-open
+# handle instead of re-opening the file for each helper call.
+DB_NAME = 'data/smart_library_v18.db'
+
+POOL_SIZE = 8             # idle connections kept per database file
+BUSY_TIMEOUT_MS = 5000    # how long a writer waits on a locked database
+STATEMENT_CACHE = 256     # prepared statements kept per connection (keyed by SQL text)
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() returns it to its pool."""
+    pool = None
+    path = None
+    idle = False
+
+    def close(self):
+        if self.pool is None: return super().close()
+        if self.idle: return  # already returned; a second close() must not hand it out twice
+        if self.in_transaction: self.rollback()
+        self.pool.release(self)
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Times each statement including stepping through its result. SELECT rows are read
+    eagerly so the row count is known, then served from memory by the fetch methods."""
+    _rows = None
+
+    def execute(self, sql, params=()):
+        t = time.perf_counter()
+        super().execute(sql, params)
+        self._rows = None
+        if self.description is not None:
+            rows = super().fetchall()
+            self._rows = iter(rows)
+        profiler.record(sql, params, time.perf_counter() - t, len(rows) if self._rows is not None else self.rowcount)
+        return self
+
+    def executemany(self, sql, seq):
+        t = time.perf_counter()
+        super().executemany(sql, seq)
+        self._rows = None
+        profiler.record(sql, None, time.perf_counter() - t, self.rowcount)
+        return self
+
+    def fetchone(self):
+        return super().fetchone() if self._rows is None else next(self._rows, None)
+
+    def fetchmany(self, size=None):
+        return super().fetchmany(size or self.arraysize) if self._rows is None else list(islice(self._rows, size or self.arraysize))
+
+    def fetchall(self):
+        return super().fetchall() if self._rows is None else list(self._rows)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return super().__next__() if self._rows is None else next(self._rows)
+
+
+class ProfiledConnection(PooledConnection):
+    """What get_db() hands out while the profiler is on (see profiler.py)."""
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE, factory=PooledConnection)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.pool, conn.path = self, self.path
+        return conn
+
+    def acquire(self):
+        try: conn = self._idle.get_nowait()
+        except queue.Empty: conn = self._connect()
+        conn.idle = False
+        conn.__class__ = ProfiledConnection if profiler.enabled else PooledConnection
+        return conn
+
+    def release(self, conn):
+        conn.idle = True
+        try: self._idle.put_nowait(conn)
+        except queue.Full: sqlite3.Connection.close(conn)
+
+    def close_all(self):
+        while True:
+            try: sqlite3.Connection.close(self._idle.get_nowait())
+            except queue.Empty: return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path=None):
+    path = path or DB_NAME
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(path, ConnectionPool(path))
+    return pool
+
+def get_db(path=None):
+    """Borrow a connection for `path` (default DB_NAME). conn.close() gives it back."""
+    return get_pool(path).acquire()
+
+def data_version(conn, name):
+    """Counter bumped by triggers whenever the data behind cache `name` changes (see schema.py)."""
+    row = conn.execute("SELECT version FROM data_versions WHERE name=?", (name,)).fetchone()
+    return row[0] if row else 0
+
+@contextmanager
+def immediate(conn):
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on error. Takes the write lock up front so
+    read-check-write sequences (seat allocation, batch jobs) cannot interleave."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback(); raise
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+# ==========================================
+# DOCUMENT STORE
+# ==========================================
+# Files are named by the SHA-256 of their content (student_documents/ab/abcd....jpg), so
+# identical uploads share one file and nothing is ever overwritten. Photos get a
+# fixed-size JPEG thumbnail, generated once and served from a byte-bounded LRU.
+DOC_ROOT = 'student_documents'
+THUMB_DIR = os.path.join(DOC_ROOT, 'thumbs')
+CHUNK = 1 << 20                 # 1 MiB per read/write while streaming uploads
+THUMB_SIZE = 256                # longest edge in pixels
+CACHE_BYTES = 32 << 20          # thumbnail bytes kept in memory
+
+def _store_path(digest, ext):
+    return os.path.join(DOC_ROOT, digest[:2], digest + ext)
+
+def put_stream(stream, name=''):
+    """Copy a binary stream into the store chunk by chunk; returns its path. Dedupes by content."""
+    ext = os.path.splitext(name)[1].lower()[:10]
+    os.makedirs(DOC_ROOT, exist_ok=True)
+    h = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=DOC_ROOT, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: stream.read(CHUNK), b''):
+                h.update(chunk); out.write(chunk)
+        path = _store_path(h.hexdigest(), ext)
+        if os.path.exists(path): os.remove(tmp)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp, path)
+        return path
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+
+def save_upload(uploaded_file):
+    if uploaded_file is None: return None
+    uploaded_file.seek(0)
+    return put_stream(uploaded_file, uploaded_file.name)
+
+def put_file(src):
+    with open(src, 'rb') as f: return put_stream(f, src)
+
+# ---- thumbnails ----
+class ByteLRU:
+    """Thread-safe LRU bounded by the total size of its values, not their count."""
+    def __init__(self, max_bytes):
+        self.max_bytes, self.size = max_bytes, 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None: self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes: return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None: self.size -= len(old)
+            self._items[key] = data; self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False); self.size -= len(evicted)
+
+_thumbs = ByteLRU(CACHE_BYTES)
+
+def thumbnail(path, size=THUMB_SIZE):
+    """JPEG bytes of a `size`px thumbnail of the image at `path`, or None if it is not an image."""
+    key = (path, size)
+    data = _thumbs.get(key)
+    if data is not None: return data
+    name = os.path.splitext(os.path.basename(path))[0]
+    thumb = os.path.join(THUMB_DIR, f"{name}_{size}.jpg")
+    if not os.path.exists(thumb):
+        try:
+            with Image.open(path) as im:
+                im.thumbnail((size, size))
+                os.makedirs(THUMB_DIR, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=THUMB_DIR, suffix='.part')
+                try:
+                    with os.fdopen(fd, 'wb') as out: im.convert('RGB').save(out, 'JPEG', quality=85)
+                    os.replace(tmp, thumb)
+                finally:
+                    if os.path.exists(tmp): os.remove(tmp)
+        except OSError: return None  # missing file, or not an image (e.g. a PDF ID proof)
+    with open(thumb, 'rb') as f: data = f.read()
+    _thumbs.put(key, data)
+    return data
+
+# ---- one-time move of legacy {phone}_{filename} uploads ----
+def migrate_legacy(conn):
+    """Schema migration step: re-home every student document that is not yet in the store."""
+    rows = conn.execute("SELECT student_id, photo_path, govt_id_path FROM students WHERE photo_path IS NOT NULL OR govt_id_path IS NOT NULL").fetchall()
+    for student_id, photo, gid in rows:
+        new = [put_file(p) if p and os.path.isfile(p) and not _in_store(p) else p for p in (photo, gid)]
+        if new != [photo, gid]:
+            conn.execute("UPDATE students SET photo_path=?, govt_id_path=? WHERE student_id=?", (*new, student_id))
+    # The legacy copies are left in place; remove_legacy() deletes them once nothing points at them.
+
+def _in_store(path):
+    name = os.path.basename(path)
+    return os.path.normpath(os.path.dirname(path)) == os.path.normpath(os.path.join(DOC_ROOT, name[:2])) and len(os.path.splitext(name)[0]) == 64
+
+def remove_legacy(conn):
+    """Delete top-level files in DOC_ROOT that no student row references. Returns the count."""
+    used = {os.path.normpath(p) for row in conn.execute("SELECT photo_path, govt_id_path FROM students") for p in row if p}
+    removed = 0
+    for entry in os.scandir(DOC_ROOT) if os.path.isdir(DOC_ROOT) else []:
+        if entry.is_file() and not entry.name.endswith('.part') and os.path.normpath(entry.path) not in used:
+            os.remove(entry.path); removed += 1
+    return removed
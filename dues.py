@@ -0,0 +1,61 @@
+import logging
+import threading
+import time
+from datetime import date
+
+from db import get_db, immediate
+from schema import DUES_STATE_SQL, GRACE_DAYS
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# BATCH DUES ENGINE
+# ==========================================
+# Recomputes students.dues_state for everyone and queues the day's reminders in a few
+# set-based statements. Run it from cron (`python manage.py dues`) or let the app keep
+# it running in-process with start_scheduler().
+_STATE = DUES_STATE_SQL.format(today=":today")
+
+STATE_SQL = f"UPDATE students SET dues_state = {_STATE} WHERE dues_state IS NOT {_STATE}"
+
+# Same wording the student page used when it wrote these one at a time.
+NOTIFY_SQL = [
+    """INSERT OR IGNORE INTO notifications (student_id, message, date)
+       SELECT student_id, 'URGENT: Membership expires in ' || CAST(julianday(due_date) - julianday(:today) AS INTEGER) || ' days.', :today
+       FROM students WHERE dues_state = 'expiring'""",
+    f"""INSERT OR IGNORE INTO notifications (student_id, message, date)
+       SELECT student_id, 'OVERDUE: Membership expired on ' || due_date || '. Renew by ' ||
+              date(due_date, '+' || ({GRACE_DAYS} + coalesce(mercy_days, 0)) || ' days') || ' to avoid suspension.', :today
+       FROM students WHERE dues_state = 'grace'""",
+]
+
+def run(conn, today=None):
+    """One pass for `today`. Returns {'changed': rows whose state moved, 'notified': new notifications, state: count}."""
+    params = {'today': str(today or date.today())}
+    with immediate(conn):
+        changed = conn.execute(STATE_SQL, params).rowcount
+        notified = sum(conn.execute(sql, params).rowcount for sql in NOTIFY_SQL)
+    report = dict(conn.execute("SELECT dues_state, count(*) FROM students GROUP BY dues_state").fetchall())
+    report.update(changed=changed, notified=notified)
+    return report
+
+# ---- in-process schedule ----
+SCHEDULE_SECONDS = 15 * 60
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def _loop(path, every):
+    while True:
+        conn = get_db(path)
+        try: run(conn)
+        except Exception: logger.exception("dues engine run failed (%s)", path)
+        finally: conn.close()
+        time.sleep(every)
+
+def start_scheduler(path=None, every=SCHEDULE_SECONDS):
+    """Start the background dues job for `path` once per process; later calls are no-ops."""
+    with _schedulers_lock:
+        if path in _schedulers: return _schedulers[path]
+        t = _schedulers[path] = threading.Thread(target=_loop, args=(path, every), name=f"dues:{path}", daemon=True)
+    t.start()
+    return t
@@ -0,0 +1,66 @@
+from datetime import date
+
+import altair as alt
+import pandas as pd
+
+from db import data_version, immediate
+from schema import ROLLUP_REBUILD
+
+# ==========================================
+# LEDGERS & P&L ROLLUPS
+# ==========================================
+# income/expenses are the raw ledgers. Triggers (schema migration 6) keep finance_daily
+# and finance_monthly current on every insert, update and delete, so nothing
+# here ever scans a ledger except rebuild().
+def record_income(conn, source, amount, remarks=None, transaction_id=None, day=None):
+    conn.execute("INSERT INTO income (source, amount, date, remarks, transaction_id) VALUES (?,?,?,?,?)",
+                 (source, amount, day or date.today(), remarks, transaction_id))
+
+def record_expense(conn, category, amount, day=None):
+    conn.execute("INSERT INTO expenses (category, amount, date) VALUES (?,?,?)", (category, amount, day or date.today()))
+
+def rebuild(conn):
+    """Regenerate both rollup tables from the raw ledgers in one transaction."""
+    with immediate(conn):
+        for sql in ROLLUP_REBUILD: conn.execute(sql)
+
+def month_window(months, today=None):
+    today = today or date.today()
+    y, m = divmod(today.year * 12 + today.month - 1 - months, 12)
+    return f"{y:04d}-{m + 1:02d}"
+
+_cache = {}  # (db path, months) -> ((finance version, month), dashboard)
+
+def dashboard(conn, months=12):
+    """Lifetime totals, a month x kind x bucket frame for the last `months` months and
+    the Altair trend charts drawn from it. Rebuilt only when the ledgers change."""
+    key = (data_version(conn, 'finance'), date.today().strftime('%Y-%m'))
+    hit = _cache.get((conn.path, months))
+    if hit and hit[0] == key: return hit[1]
+    board = summary(conn, months)
+    board['charts'] = trend_charts(board['frame'])
+    _cache[(conn.path, months)] = (key, board)
+    return board
+
+def summary(conn, months=12):
+    """Lifetime income/expense totals and the recent month x kind x bucket frame, read from finance_monthly only."""
+    totals = dict(conn.execute("SELECT kind, sum(amount) FROM finance_monthly GROUP BY kind").fetchall())
+    frame = pd.DataFrame(conn.execute("SELECT month, kind, bucket, amount FROM finance_monthly WHERE month >= ? ORDER BY month",
+                                      (month_window(months - 1),)).fetchall(), columns=['month', 'kind', 'bucket', 'amount'])
+    return {'income': totals.get('income') or 0, 'expense': totals.get('expense') or 0, 'frame': frame}
+
+def trend_charts(frame):
+    if frame.empty: return {}
+    by_kind = frame.groupby(['month', 'kind'], as_index=False)['amount'].sum()
+    pnl = by_kind.pivot(index='month', columns='kind', values='amount').reindex(columns=['income', 'expense']).fillna(0).reset_index()
+    pnl['profit'] = pnl['income'] - pnl['expense']
+    bars = alt.Chart(by_kind).mark_bar().encode(
+        x=alt.X('month:N', title=None), xOffset='kind:N', y=alt.Y('amount:Q', title='₹'),
+        color=alt.Color('kind:N', scale=alt.Scale(domain=['income', 'expense'], range=['#4CAF50', '#e53935'])),
+        tooltip=['month', 'kind', 'amount'])
+    profit = alt.Chart(pnl).mark_line(point=True, color='#1e3c72').encode(x='month:N', y='profit:Q', tooltip=['month', 'profit'])
+    def split(kind):
+        return alt.Chart(frame[frame['kind'] == kind]).mark_bar().encode(
+            x=alt.X('month:N', title=None), y=alt.Y('sum(amount):Q', title='₹'), color=alt.Color('bucket:N', title=kind.title()),
+            tooltip=['month', 'bucket', 'sum(amount)'])
+    return {'pnl': (bars + profit).properties(height=280), 'income': split('income'), 'expense': split('expense')}
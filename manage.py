@@ -0,0 +1,138 @@
+"""S-MART maintenance commands.
+
+    python manage.py migrate
+    python manage.py rebuild-rollups
+    python manage.py dues [--date YYYY-MM-DD]
+    python manage.py docs-cleanup
+    python manage.py --db data/scratch.db seed [--scale 0.1]
+    python manage.py import students branch2.csv [--dry-run] [--errors errors.csv]
+    python manage.py export income income.parquet
+    python manage.py outbox [--drain] [--purge DAYS]
+    python manage.py branches [--add CODE NAME ADMIN PASSWORD] [--report]
+    python manage.py --branch north dues       # any command, run against one branch's database
+"""
+import argparse
+from datetime import date
+
+import branches
+import bulkio
+import db
+import docstore
+import dues
+import finance
+import outbox
+import schema
+import study
+
+def cmd_migrate(args):
+    schema.migrate(args.db)
+    print(f"{args.db}: schema at version {schema.LATEST}")
+
+def cmd_rebuild_rollups(args):
+    schema.migrate(args.db)
+    conn = db.get_db(args.db)
+    try:
+        finance.rebuild(conn); study.rebuild(conn)
+        for kind, months, total in conn.execute("SELECT kind, count(DISTINCT month), sum(amount) FROM finance_monthly GROUP BY kind"):
+            print(f"{kind:>8}: {months} months, ₹{total:,.0f}")
+        days, minutes = conn.execute("SELECT count(*), sum(minutes) FROM study_daily").fetchone()
+        print(f"   study: {days} student-days, {minutes or 0:,} minutes")
+    finally: conn.close()
+
+def cmd_dues(args):
+    schema.migrate(args.db)
+    conn = db.get_db(args.db)
+    try: report = dues.run(conn, args.date)
+    finally: conn.close()
+    print(", ".join(f"{k}={v}" for k, v in sorted(report.items(), key=lambda kv: str(kv[0]))))
+
+def cmd_docs_cleanup(args):
+    schema.migrate(args.db)
+    conn = db.get_db(args.db)
+    try: print(f"removed {docstore.remove_legacy(conn)} unreferenced legacy upload(s) from {docstore.DOC_ROOT}/")
+    finally: conn.close()
+
+def cmd_seed(args):
+    from bench.seed import seed
+    try: counts = seed(args.db, args.scale)
+    except (ValueError, FileExistsError) as e: raise SystemExit(f"seed: {e}")
+    print(f"{args.db}: " + ", ".join(f"{k}={v:,}" for k, v in counts.items()))
+
+def cmd_import(args):
+    schema.migrate(args.db)
+    conn = db.get_db(args.db)
+    try:
+        with open(args.file, 'rb') as f:
+            report = bulkio.import_file(conn, args.table, f, args.format or bulkio.guess_format(args.file), dry_run=args.dry_run)
+    finally: conn.close()
+    print(f"{args.table}: {report['inserted']} {'valid' if args.dry_run else 'imported'}, {report['failed']} rejected")
+    for n, msg in report['errors'][:20]: print(f"  row {n}: {msg}")
+    if report['failed'] > 20: print(f"  ... and {report['failed'] - 20} more")
+    if args.errors:
+        with open(args.errors, 'w', newline='') as f: f.write(bulkio.error_csv(report))
+
+def cmd_export(args):
+    schema.migrate(args.db)
+    conn = db.get_db(args.db)
+    try: n = bulkio.export(conn, args.table, args.file, args.format or bulkio.guess_format(args.file))
+    finally: conn.close()
+    print(f"{args.table}: {n:,} rows written to {args.file}")
+
+def cmd_outbox(args):
+    schema.migrate(args.db)
+    conn = db.get_db(args.db)
+    try:
+        if args.drain: print(f"delivered {outbox.drain(conn, timeout=args.timeout):,} message(s)")
+        if args.purge is not None: print(f"purged {outbox.purge(conn, args.purge):,} sent message(s)"); conn.commit()
+        for (channel, status), n in sorted(outbox.stats(conn).items()): print(f"{channel:>9} {status:<8} {n:,}")
+    finally: conn.close()
+
+def cmd_branches(args):
+    if args.add: print(f"created {branches.add(*args.add).path}")
+    for b in branches.registered(): print(f"{b.code:>12}  {b.name:<24} {b.path}")
+    if args.report:
+        report = branches.consolidated()
+        for code, err in report['errors'].items(): print(f"{code}: {err}")
+        for name, frame in (('occupancy', report['occupancy']), ('dues', report['dues']), ('p&l', report['pnl'])):
+            print(f"\n{name}\n{frame.to_string(index=False)}")
+
+def build_parser():
+    ap = argparse.ArgumentParser(description="S-MART maintenance commands")
+    ap.add_argument('--db', default=db.DB_NAME, help=f"database file (default {db.DB_NAME})")
+    ap.add_argument('--branch', help="use this branch's database instead of --db (see 'branches')")
+    sub = ap.add_subparsers(dest='command', required=True)
+    sub.add_parser('migrate', help="apply pending schema migrations").set_defaults(func=cmd_migrate)
+    sub.add_parser('rebuild-rollups', help="regenerate finance and study rollups from the raw logs").set_defaults(func=cmd_rebuild_rollups)
+    p = sub.add_parser('dues', help="recompute dues/lockout state and queue reminders for every student")
+    p.add_argument('--date', type=date.fromisoformat, help="evaluate as of this day (default today)")
+    p.set_defaults(func=cmd_dues)
+    sub.add_parser('docs-cleanup', help="delete pre-store uploads that no student references any more").set_defaults(func=cmd_docs_cleanup)
+    p = sub.add_parser('seed', help="create --db filled with synthetic data for benchmarks (never the live database)")
+    p.add_argument('--scale', type=float, default=1.0, help="fraction of the full volumes (default 1.0)")
+    p.set_defaults(func=cmd_seed)
+    for name, verb in (('import', "validate and bulk-insert rows from a CSV/Parquet file"), ('export', "stream a table to a CSV/Parquet file")):
+        p = sub.add_parser(name, help=verb)
+        p.add_argument('table', choices=list(bulkio.TABLES)); p.add_argument('file')
+        p.add_argument('--format', choices=bulkio.FORMATS, help="default: from the file extension")
+        if name == 'import':
+            p.add_argument('--dry-run', action='store_true', help="validate only, write nothing")
+            p.add_argument('--errors', help="write rejected rows (row number, reason) to this CSV")
+        p.set_defaults(func=cmd_import if name == 'import' else cmd_export)
+    p = sub.add_parser('outbox', help="show outbox counts; optionally deliver or purge")
+    p.add_argument('--drain', action='store_true', help="deliver everything due now in this process")
+    p.add_argument('--timeout', type=float, default=300, help="stop draining after this many seconds (default 300)")
+    p.add_argument('--purge', type=int, metavar='DAYS', help="delete sent messages older than DAYS")
+    p.set_defaults(func=cmd_outbox)
+    p = sub.add_parser('branches', help="list branches; add one or print the cross-branch report")
+    p.add_argument('--add', nargs=4, metavar=('CODE', 'NAME', 'ADMIN', 'PASSWORD'), help="register a branch and create its database with this branch admin")
+    p.add_argument('--report', action='store_true', help="consolidated occupancy, dues and P&L")
+    p.set_defaults(func=cmd_branches)
+    return ap
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.branch: args.db = branches.get(args.branch).path
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import smtplib
+import threading
+import time
+import urllib.request
+from collections import deque, namedtuple
+from datetime import date, datetime
+from email.message import EmailMessage
+
+from db import get_db, immediate
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# OUTBOX & DELIVERY WORKERS
+# ==========================================
+# Pages never send anything themselves: they add rows to `outbox` (schema migration 12)
+# and return. A small pool of daemon threads claims due rows in batches, hands each batch
+# to the channel's sender under that channel's rate limit, and records the outcome.
+# Failed sends are retried with exponential backoff; every row carries an idempotency
+# key, so enqueueing the same reminder twice is a no-op and gateways can dedupe retries.
+WORKERS = 2
+POLL_SECONDS = 1.0
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30            # first retry; doubles per attempt, capped at BACKOFF_MAX
+BACKOFF_MAX = 3600
+CLAIM_TIMEOUT = 300             # a 'sending' row older than this belongs to a dead worker
+KEEP_SENT_DAYS = 30             # the workers purge sent rows older than this ...
+PURGE_EVERY = 3600              # ... once an hour
+
+Message = namedtuple('Message', 'id channel student_id recipient message idem_key attempts')
+
+# ---- senders ----
+# A sender delivers a batch and returns {message id: error text} for the ones that failed.
+class Sender:
+    rate = None                 # messages per second for this channel; None = unlimited
+    batch = 50
+    transactional = False       # True: send() only writes to the database, run it in the claim's transaction
+
+    def send(self, conn, messages):
+        raise NotImplementedError
+
+class InAppSender(Sender):
+    """The student Hub's notifications table. ux_notifications_dedupe drops same-day repeats."""
+    batch = 500
+    transactional = True
+
+    def send(self, conn, messages):
+        conn.executemany("INSERT OR IGNORE INTO notifications (student_id, message, date) VALUES (?,?,?)",
+                         [(m.student_id, m.message, date.today()) for m in messages])
+        return {}
+
+class StubSender(Sender):
+    """Offline stand-in for a gateway: keeps the last `keep` messages in `sent`. With
+    `fail_every` N, every Nth call fails, which exercises the retry path."""
+    def __init__(self, rate=None, batch=50, latency=0.0, fail_every=0, keep=1000):
+        self.rate, self.batch, self.latency, self.fail_every = rate, batch, latency, fail_every
+        self.sent = deque(maxlen=keep)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def send(self, conn, messages):
+        if self.latency: time.sleep(self.latency)
+        errors = {}
+        with self._lock:
+            for m in messages:
+                self.calls += 1
+                if self.fail_every and self.calls % self.fail_every == 0: errors[m.id] = "stub failure"
+                else: self.sent.append(m)
+        return errors
+
+class GatewaySender(Sender):
+    """WhatsApp/SMS HTTP gateway: one JSON POST per message {to, message}, bearer token,
+    and the outbox key as Idempotency-Key so a retried request is not delivered twice."""
+    def __init__(self, url, token=None, rate=10, batch=20, timeout=10):
+        self.url, self.token, self.rate, self.batch, self.timeout = url, token, rate, batch, timeout
+
+    def send(self, conn, messages):
+        errors = {}
+        for m in messages:
+            req = urllib.request.Request(self.url, data=json.dumps({'to': m.recipient, 'message': m.message}).encode(), method='POST',
+                                         headers={'Content-Type': 'application/json', 'Idempotency-Key': m.idem_key,
+                                                  **({'Authorization': f"Bearer {self.token}"} if self.token else {})})
+            try:
+                with urllib.request.urlopen(req, timeout=self.timeout): pass
+            except OSError as e: errors[m.id] = str(e)[:200]
+        return errors
+
+class EmailSender(Sender):
+    def __init__(self, host, port=587, user=None, password=None, sender='noreply@smart-library', rate=2, batch=20):
+        self.host, self.port, self.user, self.password, self.sender = host, port, user, password, sender
+        self.rate, self.batch = rate, batch
+
+    def send(self, conn, messages):
+        errors = {}
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            smtp.starttls()
+            if self.user: smtp.login(self.user, self.password)
+            for m in messages:
+                msg = EmailMessage()
+                msg['From'], msg['To'], msg['Subject'], msg['Message-ID'] = self.sender, m.recipient, "S-MART Library", f"<{m.idem_key}@smart>"
+                msg.set_content(m.message)
+                try: smtp.send_message(msg)
+                except smtplib.SMTPException as e: errors[m.id] = str(e)[:200]
+        return errors
+
+def default_senders(stubs=False):
+    """In-app plus the gateways configured through the environment. A channel with no
+    gateway has no sender, so nothing is queued for it; `stubs` fills those with StubSenders
+    (benchmarks and tests only: a stub marks its rows sent without delivering anything)."""
+    env = os.environ.get
+    senders = {'inapp': InAppSender()}
+    if env('SMART_WHATSAPP_URL'): senders['whatsapp'] = GatewaySender(env('SMART_WHATSAPP_URL'), env('SMART_WHATSAPP_TOKEN'), rate=20)
+    elif stubs: senders['whatsapp'] = StubSender(rate=20)
+    if env('SMART_SMS_URL'): senders['sms'] = GatewaySender(env('SMART_SMS_URL'), env('SMART_SMS_TOKEN'), rate=10)
+    elif stubs: senders['sms'] = StubSender(rate=10)
+    if env('SMART_SMTP_HOST'): senders['email'] = EmailSender(env('SMART_SMTP_HOST'), int(env('SMART_SMTP_PORT', 587)), env('SMART_SMTP_USER'), env('SMART_SMTP_PASSWORD'))
+    elif stubs: senders['email'] = StubSender(rate=5)
+    return senders
+
+SENDERS = default_senders()
+RECIPIENT = {'inapp': "NULL", 'whatsapp': "s.phone", 'sms': "s.phone", 'email': "s.email"}
+
+# ---- per-channel rate limits ----
+class TokenBucket:
+    """Shared by all workers in the process. reserve() hands out up to n tokens now."""
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens, self.stamp = self.capacity, time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate); self.stamp = now
+            got = min(n, int(self.tokens))
+            self.tokens -= got
+            return got
+
+    def refund(self, n):
+        if n > 0:
+            with self._lock: self.tokens = min(self.capacity, self.tokens + n)
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def _reserve(channel, sender):
+    if not sender.rate: return sender.batch
+    bucket = _buckets.get(channel)
+    if bucket is None or bucket.rate != sender.rate:
+        with _buckets_lock:
+            bucket = _buckets.get(channel)
+            if bucket is None or bucket.rate != sender.rate: bucket = _buckets[channel] = TokenBucket(sender.rate)
+    return bucket.reserve(sender.batch)
+
+def _refund(channel, n):
+    if channel in _buckets: _buckets[channel].refund(n)
+
+# ---- enqueue ----
+_wake = threading.Event()
+
+_namespaces = {}  # db path -> its meta.db_id
+
+def namespace(conn):
+    """Prefix of every key this database queues. Each branch numbers students from 1 and
+    the gateways are shared, so a bare 'whatsapp:remind:1:<day>' would dedupe across branches."""
+    ns = _namespaces.get(conn.path)
+    if ns is None: ns = _namespaces[conn.path] = conn.execute("SELECT value FROM meta WHERE key='db_id'").fetchone()[0]
+    return ns
+
+def _key(conn, channel, student_id, message, day=None):
+    return f"{namespace(conn)}:{channel}:{student_id}:{day or date.today()}:" + hashlib.sha1(message.encode()).hexdigest()[:16]
+
+def enqueue(conn, channel, student_id, message, key=None, recipient=None):
+    """Queue one message; returns False if its key was already queued. Caller commits.
+    The default key makes the same message to the same student once a day."""
+    if channel not in SENDERS: raise ValueError(f"no sender configured for channel {channel!r}")
+    if recipient is None and RECIPIENT[channel] != "NULL":
+        row = conn.execute(f"SELECT {RECIPIENT[channel]} FROM students s WHERE student_id=?", (student_id,)).fetchone()
+        recipient = row[0] if row else None
+    added = conn.execute("INSERT OR IGNORE INTO outbox (channel, student_id, recipient, message, idem_key, created_at) VALUES (?,?,?,?,?,?)",
+                         (channel, student_id, recipient, message, f"{namespace(conn)}:{key}" if key else _key(conn, channel, student_id, message), datetime.now())).rowcount
+    _wake.set()
+    return bool(added)
+
+REMINDER_SQL = """INSERT OR IGNORE INTO outbox (channel, student_id, recipient, message, idem_key, created_at)
+    SELECT :channel, s.student_id, {recipient},
+           CASE s.dues_state WHEN 'expiring' THEN 'Reminder: your S-MART membership ends on ' || s.due_date || '. Please renew.'
+                ELSE 'Fees due: your S-MART membership expired on ' || s.due_date || '. Please renew to keep your seat.' END,
+           :ns || ':' || :channel || ':remind:' || s.student_id || ':' || :today, :now
+    FROM students s WHERE s.dues_state IN ('expiring', 'grace', 'suspended') {only}"""
+
+REMINDER_CHANNELS = ('inapp', 'whatsapp')
+
+def reminder_channels():
+    """The default reminder channels that have a sender in this process."""
+    return [c for c in REMINDER_CHANNELS if c in SENDERS]
+
+def remind_defaulters(conn, channels=None, student_ids=None, today=None):
+    """Queue today's fee reminder for every student whose dues are expiring or overdue (or
+    just `student_ids`), one set-based INSERT per channel (default: reminder_channels()).
+    At most one per student, channel and day. Returns how many were queued."""
+    channels = reminder_channels() if channels is None else channels
+    missing = [c for c in channels if c not in SENDERS]
+    if missing: raise ValueError(f"no sender configured for channel(s) {', '.join(missing)}")
+    params = {'today': str(today or date.today()), 'now': datetime.now(), 'ns': namespace(conn)}
+    only = ""
+    if student_ids is not None:
+        ids = [int(i) for i in student_ids] or [0]
+        only = f"AND s.student_id IN ({','.join(map(str, ids))})"
+    queued = 0
+    with immediate(conn):
+        for channel in channels:
+            recipient = RECIPIENT[channel]
+            sql = REMINDER_SQL.format(recipient=recipient, only=only + ("" if recipient == "NULL" else f" AND {recipient} IS NOT NULL"))
+            queued += conn.execute(sql, {**params, 'channel': channel}).rowcount
+    _wake.set()
+    return queued
+
+# ---- delivery ----
+def _claim(conn, channel, n, worker):
+    now = time.time()
+    with immediate(conn):
+        rows = conn.execute("""UPDATE outbox SET status='sending', claimed_by=?, claimed_at=? WHERE id IN
+            (SELECT id FROM outbox WHERE status='queued' AND channel=? AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?)
+            RETURNING id, channel, student_id, recipient, message, idem_key, attempts""", (worker, now, channel, now, n)).fetchall()
+    return [Message(*r) for r in rows]
+
+def _settle(conn, messages, errors):
+    now = time.time()
+    sent = [(datetime.now(), m.id) for m in messages if m.id not in errors]
+    conn.executemany("UPDATE outbox SET status='sent', attempts=attempts+1, sent_at=?, last_error=NULL WHERE id=?", sent)
+    retry = []
+    for m in messages:
+        if m.id not in errors: continue
+        delay = min(BACKOFF_MAX, BACKOFF_SECONDS * 2 ** m.attempts) * random.uniform(1, 1.25)
+        retry.append(('failed' if m.attempts + 1 >= MAX_ATTEMPTS else 'queued', now + delay, errors[m.id], m.id))
+    conn.executemany("UPDATE outbox SET status=?, attempts=attempts+1, next_attempt_at=?, last_error=?, claimed_by=NULL WHERE id=?", retry)
+
+def _deliver(conn, sender, messages):
+    if sender.transactional:
+        with immediate(conn): _settle(conn, messages, sender.send(conn, messages))
+        return
+    try: errors = sender.send(conn, messages)
+    except Exception as e: errors = {m.id: f"{type(e).__name__}: {e}"[:200] for m in messages}
+    with immediate(conn): _settle(conn, messages, errors)
+
+def requeue_stale(conn, timeout=CLAIM_TIMEOUT):
+    if conn.execute("SELECT 1 FROM outbox WHERE status='sending' AND claimed_at < ? LIMIT 1", (time.time() - timeout,)).fetchone() is None: return 0
+    with immediate(conn):
+        return conn.execute("UPDATE outbox SET status='queued', claimed_by=NULL WHERE status='sending' AND claimed_at < ?",
+                            (time.time() - timeout,)).rowcount
+
+def _due(conn, channel):
+    # Plain read on ix_outbox_due: an idle poll never takes the write lock
+    return conn.execute("SELECT 1 FROM outbox WHERE status='queued' AND channel=? AND next_attempt_at <= ? LIMIT 1",
+                        (channel, time.time())).fetchone() is not None
+
+def drain_once(conn, worker='main'):
+    """One pass over every channel with due rows: claim what the rate limit allows, send, record. Returns messages handled."""
+    handled = 0
+    for channel, sender in list(SENDERS.items()):
+        if not _due(conn, channel): continue
+        n = _reserve(channel, sender)
+        if not n: continue
+        messages = _claim(conn, channel, n, worker)
+        if sender.rate: _refund(channel, n - len(messages))
+        if messages: _deliver(conn, sender, messages); handled += len(messages)
+    return handled
+
+def drain(conn, until_empty=True, timeout=None):
+    """Deliver in the calling thread (CLI, tests) until nothing is due or `timeout` seconds pass."""
+    start, total = time.monotonic(), 0
+    while timeout is None or time.monotonic() - start < timeout:
+        n = drain_once(conn)
+        total += n
+        if not n:
+            if until_empty and not pending(conn): break
+            time.sleep(0.05)
+    return total
+
+def pending(conn):
+    return conn.execute("SELECT count(*) FROM outbox WHERE status='queued' AND next_attempt_at <= ?", (time.time(),)).fetchone()[0]
+
+def stats(conn):
+    """{(channel, status): count}, read off ix_outbox_status."""
+    return {(c, s): n for s, c, n in conn.execute("SELECT status, channel, count(*) FROM outbox GROUP BY status, channel")}
+
+def purge(conn, days=KEEP_SENT_DAYS):
+    """Delete sent rows older than `days`. Caller commits."""
+    return conn.execute("DELETE FROM outbox WHERE status='sent' AND sent_at < datetime('now', ?)", (f"-{int(days)} days",)).rowcount
+
+# ---- in-process worker pool ----
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _loop(path, worker):
+    last_sweep = last_purge = 0
+    while True:
+        handled = 0
+        conn = get_db(path)
+        try:
+            if time.monotonic() - last_sweep > CLAIM_TIMEOUT: requeue_stale(conn); last_sweep = time.monotonic()
+            if time.monotonic() - last_purge > PURGE_EVERY:
+                with immediate(conn): purge(conn)
+                last_purge = time.monotonic()
+            handled = drain_once(conn, worker)
+        except Exception: logger.exception("outbox worker %s failed (%s)", worker, path)
+        finally: conn.close()
+        if not handled:
+            _wake.wait(POLL_SECONDS); _wake.clear()
+
+def start_workers(path=None, workers=WORKERS):
+    """Start the delivery threads for `path` once per process; later calls are no-ops."""
+    with _pools_lock:
+        if path in _pools: return _pools[path]
+        threads = _pools[path] = [threading.Thread(target=_loop, args=(path, f"{os.getpid()}:w{i}"), name=f"outbox:{path}:w{i}", daemon=True)
+                                  for i in range(workers)]
+    for t in threads: t.start()
+    return threads
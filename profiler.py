@@ -0,0 +1,114 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# ==========================================
+# QUERY & RENDER PROFILER
+# ==========================================
+# Off by default. When on, connections handed out by db.get_db() time every statement
+# (db.ProfiledConnection) and span() times page sections; both land in bounded ring
+# buffers that the admin Performance tab reads. Statements slower than SLOW_MS are also
+# appended to a JSON-lines slow log. When off, connections are plain PooledConnections
+# and span() is a flag check, so the hot path costs nothing.
+QUERY_RING = 2000               # statements kept in memory
+SPAN_RING = 1000                # section timings kept in memory
+SLOW_MS = float(os.environ.get('SMART_SLOW_MS', 100))
+SLOW_LOG = os.environ.get('SMART_SLOW_LOG', 'data/slow_queries.log')   # '' disables the file
+
+enabled = os.environ.get('SMART_PROFILE', '') not in ('', '0')
+queries = deque(maxlen=QUERY_RING)
+spans = deque(maxlen=SPAN_RING)
+_local = threading.local()
+_log_lock = threading.Lock()
+
+def configure(on=None, slow_ms=None, slow_log=None):
+    """Change settings at runtime. Takes effect for connections borrowed afterwards."""
+    global enabled, SLOW_MS, SLOW_LOG
+    if on is not None: enabled = bool(on)
+    if slow_ms is not None: SLOW_MS = float(slow_ms)
+    if slow_log is not None: SLOW_LOG = slow_log
+
+def clear():
+    queries.clear(); spans.clear()
+
+def params_shape(params):
+    """What was bound, without the values: '3 args', ':today,:size', 'none'."""
+    if not params: return 'none'
+    if isinstance(params, dict): return ",".join(f":{k}" for k in params)
+    return f"{len(params)} args"
+
+def record(sql, params, seconds, rows):
+    # Only statements inside a span (page code) go to the ring: the dues and outbox threads
+    # poll around the clock and would push page queries out. Slow ones are still logged,
+    # under their thread's name.
+    ms, section = seconds * 1000, current_section()
+    if section is None and (ms < SLOW_MS or not SLOW_LOG): return
+    event = {'sql': " ".join(sql.split()), 'params': params_shape(params), 'ms': ms, 'rows': rows,
+             'section': section or threading.current_thread().name, 'at': time.time()}
+    if section is not None: queries.append(event)
+    if ms >= SLOW_MS and SLOW_LOG:
+        with _log_lock:
+            folder = os.path.dirname(SLOW_LOG)
+            if folder: os.makedirs(folder, exist_ok=True)
+            with open(SLOW_LOG, 'a') as f:
+                f.write(json.dumps({**event, 'at': datetime.fromtimestamp(event['at']).isoformat(timespec='seconds')}) + "\n")
+
+def current_section():
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+@contextmanager
+def span(name, root=False):
+    """Time a page section. Nested spans are recorded as 'outer/inner'; a `root` span is
+    recorded as plain `name` wherever it runs, so a fragment timed inside a full run and on
+    its own lands in the same section."""
+    if not enabled:
+        yield; return
+    stack = getattr(_local, 'stack', None)
+    if stack is None: stack = _local.stack = []
+    stack.append(f"{stack[-1]}/{name}" if stack and not root else name)
+    t = time.perf_counter()
+    try: yield
+    finally:
+        spans.append({'section': stack.pop(), 'ms': (time.perf_counter() - t) * 1000, 'at': time.time()})
+
+# ---- reports for the Performance tab ----
+def section_times():
+    """[(section, renders, last ms, median ms, max ms)] slowest median first."""
+    by = {}
+    for s in list(spans): by.setdefault(s['section'], []).append(s['ms'])
+    rows = [(name, len(ms), ms[-1], sorted(ms)[len(ms) // 2], max(ms)) for name, ms in by.items()]
+    return sorted(rows, key=lambda r: -r[3])
+
+def slowest(n=10):
+    """Top `n` statements by worst time, one row per distinct SQL text:
+    (sql, params shape, calls, mean ms, max ms, rows of the worst call, section of the worst call)."""
+    by = {}
+    for q in list(queries):
+        agg = by.get(q['sql'])
+        if agg is None: by[q['sql']] = agg = {'calls': 0, 'total': 0.0, 'worst': q}
+        agg['calls'] += 1; agg['total'] += q['ms']
+        if q['ms'] > agg['worst']['ms']: agg['worst'] = q
+    top = sorted(by.items(), key=lambda kv: -kv[1]['worst']['ms'])[:n]
+    return [(sql, a['worst']['params'], a['calls'], a['total'] / a['calls'], a['worst']['ms'], a['worst']['rows'], a['worst']['section'])
+            for sql, a in top]
+
+def explain(conn, sql, shape):
+    """EXPLAIN QUERY PLAN for a recorded statement, binding NULLs of the recorded shape.
+    Runs on the raw connection so it is not itself recorded. Returns plan lines or None."""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')): return None
+    if shape == 'none': params = ()
+    elif shape.startswith(':'): params = {k[1:]: None for k in shape.split(',')}
+    else: params = (None,) * int(shape.split()[0])
+    try: rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    except Exception as e: return [f"(no plan: {e})"]
+    depth, lines = {0: 0}, []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, 0) + 1
+        lines.append("  " * (depth[node] - 1) + detail)
+    return lines
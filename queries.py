@@ -0,0 +1,32 @@
+import pandas as pd
+
+# ==========================================
+# PAGE QUERIES
+# ==========================================
+# The read paths the dashboards use that do not belong to a bigger module. Kept here so
+# the benchmark harness (bench/harness.py) times exactly what the pages run.
+def latest_notice(conn):
+    row = conn.execute("SELECT message FROM notices ORDER BY id DESC LIMIT 1").fetchone()
+    return row[0] if row else None
+
+def recent_notifications(conn, student_id, n=3):
+    return pd.read_sql("SELECT * FROM notifications WHERE student_id=? ORDER BY id DESC LIMIT ?", conn, params=(student_id, n))
+
+def ticket_history(conn, student_id):
+    return pd.read_sql("SELECT * FROM complaints WHERE student_id=? ORDER BY ticket_id DESC", conn, params=(student_id,))
+
+def open_tickets(conn):
+    return pd.read_sql("SELECT * FROM complaints WHERE status='Open' ORDER BY ticket_id DESC", conn)
+
+def pending_students(conn):
+    return conn.execute("SELECT student_id, name, exam, wants_locker FROM students WHERE is_profile_approved=0 ORDER BY student_id").fetchall()
+
+def seatless_students(conn):
+    return conn.execute("SELECT student_id, name FROM students WHERE is_profile_approved=1 AND is_seat_approved=0 ORDER BY student_id").fetchall()
+
+def available_seat_labels(conn):
+    return [r[0] for r in conn.execute("SELECT seat_label FROM seats WHERE status='Available' ORDER BY floor, row_no, col_no")]
+
+def admin_login(conn, username, password):
+    """(username, role) or None. 'Super' admins also manage branches; branch admins are 'Admin'."""
+    return conn.execute("SELECT username, role FROM admins WHERE username=? AND password=?", (username, password)).fetchone()
@@ -0,0 +1,39 @@
+import re
+from datetime import date
+
+# ==========================================
+# MASTER LIST (FILTER, SEARCH, KEYSET PAGING)
+# ==========================================
+PAGE_SIZE = 25
+
+# filter -> (WHERE clause, keyset condition). Date filters walk ix_students_due_date in
+# (due_date, student_id) order; 'All' walks the primary key.
+FILTERS = {
+    'Active': ("s.due_date >= :today", "(s.due_date, s.student_id) > (:k_due, :k_id)", "s.due_date, s.student_id"),
+    'Defaulters': ("s.due_date < date(:today, '+5 days')", "(s.due_date, s.student_id) > (:k_due, :k_id)", "s.due_date, s.student_id"),
+    'All': ("1", "s.student_id > :k_id", "s.student_id"),
+}
+
+def fts_query(text):
+    """User text -> FTS5 prefix query: every word must match the start of some token."""
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{w}"*' for w in words)
+
+def page(conn, filter_opt='All', search='', after=None, size=PAGE_SIZE, today=None):
+    """One page of non-pending students. Returns (rows, cursor for the next page or None).
+    rows are (student_id, name, phone, due_date, status); pass the cursor back as `after`."""
+    where, keyset, order = FILTERS[filter_opt]
+    params = {'today': str(today or date.today()), 'size': size + 1}
+    clauses = ["s.status != 'Pending'", where]
+    src = "students s"
+    match = fts_query(search)
+    if match:
+        src = "students_fts f JOIN students s ON s.student_id = f.rowid"
+        clauses.append("students_fts MATCH :match"); params['match'] = match
+    if after is not None:
+        clauses.append(keyset); params['k_due'], params['k_id'] = after
+    rows = conn.execute(f"SELECT s.student_id, s.name, s.phone, s.due_date, s.status FROM {src} "
+                        f"WHERE {' AND '.join(clauses)} ORDER BY {order} LIMIT :size", params).fetchall()
+    if len(rows) <= size: return rows, None
+    rows = rows[:size]
+    return rows, (rows[-1][3], rows[-1][0])
@@ -0,0 +1,247 @@
+import os
+from datetime import datetime
+
+import docstore
+from db import DB_NAME, get_db
+
+# ==========================================
+# SCHEMA & MIGRATIONS
+# ==========================================
+def init_db(conn):
+    c = conn.cursor()
+
+    # 1. CORE
+    c.execute('''CREATE TABLE IF NOT EXISTS admins (username TEXT PRIMARY KEY, password TEXT, role TEXT)''')
+    c.execute("INSERT OR IGNORE INTO admins VALUES ('admin', 'admin123', 'Super')")
+    c.execute('''CREATE TABLE IF NOT EXISTS seats (seat_id INTEGER PRIMARY KEY AUTOINCREMENT, seat_label TEXT UNIQUE, has_locker INTEGER, status TEXT DEFAULT 'Available')''')
+
+    # 2. STUDENTS
+    c.execute('''CREATE TABLE IF NOT EXISTS students (
+        student_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT, phone TEXT UNIQUE, password TEXT, exam TEXT,
+        email TEXT, father_name TEXT, guardian_phone TEXT, address TEXT,
+        photo_path TEXT, govt_id_path TEXT,
+        joining_date DATE, due_date DATE,
+        is_profile_approved INTEGER DEFAULT 0, is_seat_approved INTEGER DEFAULT 0,
+        assigned_seat_id INTEGER, mercy_days INTEGER DEFAULT 0,
+        status TEXT DEFAULT 'Pending',
+        xp_points INTEGER DEFAULT 0
+    )''')
+
+    # 3. OPS & FINANCE
+    c.execute('''CREATE TABLE IF NOT EXISTS expenses (id INTEGER PRIMARY KEY AUTOINCREMENT, category TEXT, amount INTEGER, date DATE)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS income (id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT, amount INTEGER, date DATE, remarks TEXT, transaction_id TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS notices (id INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT, type TEXT, date DATE)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS notifications (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, message TEXT, date DATE, is_read INTEGER DEFAULT 0)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS seat_requests (req_id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, current_seat TEXT, requested_seat TEXT, reason TEXT, status TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS complaints (ticket_id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, category TEXT, priority TEXT, message TEXT, status TEXT DEFAULT 'Open', date DATE)''')
+
+    # 4. PRODUCTIVITY & GUESTS
+    c.execute('''CREATE TABLE IF NOT EXISTS study_logs (log_id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, date DATE, start_time TIMESTAMP, end_time TIMESTAMP, duration_minutes INTEGER, session_type TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS tasks (task_id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, task TEXT, is_done INTEGER DEFAULT 0, date DATE)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS student_targets (student_id INTEGER PRIMARY KEY, daily_target_hours INTEGER DEFAULT 6)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS guests (guest_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, phone TEXT, date DATE, amount_paid INTEGER)''')
+
+    # Seed Seats
+    c.execute('SELECT count(*) FROM seats')
+    if c.fetchone()[0] == 0:
+        seats = [(f"A-{i}", 1 if i%5==0 else 0, 'Available') for i in range(1, 101)]
+        c.executemany('INSERT INTO seats (seat_label, has_locker, status) VALUES (?,?,?)', seats)
+
+# ==========================================
+# FINANCE ROLLUPS
+# ==========================================
+# Ledger -> (rollup kind, SQL bucket expression over row {r}). Income sources look like
+# "Fee: <name>", so everything before the colon is the bucket.
+LEDGERS = {
+    'income': ('income', "CASE WHEN instr({r}.source, ':') > 0 THEN trim(substr({r}.source, 1, instr({r}.source, ':') - 1)) ELSE coalesce({r}.source, 'Other') END"),
+    'expenses': ('expense', "coalesce({r}.category, 'Other')"),
+}
+
+def _rollup_apply(kind, bucket, r, sign):
+    b = bucket.format(r=r)
+    return "".join(
+        f"INSERT INTO {table} VALUES ({period}, '{kind}', {b}, {sign}coalesce({r}.amount, 0), {sign}1) "
+        f"ON CONFLICT ({key}, kind, bucket) DO UPDATE SET amount = amount + excluded.amount, entries = entries + excluded.entries; "
+        for table, key, period in (('finance_daily', 'day', f"{r}.date"), ('finance_monthly', 'month', f"strftime('%Y-%m', {r}.date)")))
+
+def _rollup_triggers(ledger):
+    kind, bucket = LEDGERS[ledger]
+    bump = "UPDATE data_versions SET version=version+1 WHERE name='finance';"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_{ledger}_ins_rollup AFTER INSERT ON {ledger} BEGIN {_rollup_apply(kind, bucket, 'NEW', '')} {bump} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{ledger}_del_rollup AFTER DELETE ON {ledger} BEGIN {_rollup_apply(kind, bucket, 'OLD', '-')} {bump} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{ledger}_upd_rollup AFTER UPDATE ON {ledger} BEGIN "
+        f"{_rollup_apply(kind, bucket, 'OLD', '-')} {_rollup_apply(kind, bucket, 'NEW', '')} {bump} END",
+    ]
+
+ROLLUP_REBUILD = ["DELETE FROM finance_daily", "DELETE FROM finance_monthly"] + [
+    f"INSERT INTO {table} SELECT {period}, '{kind}', {bucket.format(r=ledger)}, sum(coalesce(amount, 0)), count(*) FROM {ledger} GROUP BY 1, 3"
+    for ledger, (kind, bucket) in LEDGERS.items()
+    for table, period in (('finance_daily', f"{ledger}.date"), ('finance_monthly', f"strftime('%Y-%m', {ledger}.date)"))
+] + ["UPDATE data_versions SET version=version+1 WHERE name='finance'"]
+
+# ==========================================
+# STUDY ROLLUP
+# ==========================================
+def _study_apply(r, sign):
+    return (f"INSERT INTO study_daily VALUES ({r}.student_id, {r}.date, {sign}coalesce({r}.duration_minutes, 0), {sign}1) "
+            f"ON CONFLICT (student_id, date) DO UPDATE SET minutes = minutes + excluded.minutes, sessions = sessions + excluded.sessions;")
+
+STUDY_REBUILD = [
+    "DELETE FROM study_daily",
+    "INSERT INTO study_daily SELECT student_id, date, sum(coalesce(duration_minutes, 0)), count(*) FROM study_logs GROUP BY student_id, date",
+]
+
+# ==========================================
+# DUES STATE
+# ==========================================
+# Single source of truth for a student's dues state on {today}: 'expiring' inside the
+# last week, 'grace' once overdue, 'suspended' after 5 days + mercy_days, 'locked'
+# when an admin locked the account. Used by the batch engine and the row triggers.
+GRACE_DAYS = 5
+EXPIRING_DAYS = 7
+DUES_STATE_SQL = f"""CASE WHEN status = 'Locked' THEN 'locked'
+    WHEN status != 'Active' OR julianday(due_date) IS NULL THEN 'ok'
+    WHEN julianday({{today}}) > julianday(due_date) + {GRACE_DAYS} + coalesce(mercy_days, 0) THEN 'suspended'
+    WHEN julianday(due_date) < julianday({{today}}) THEN 'grace'
+    WHEN julianday(due_date) - julianday({{today}}) < {EXPIRING_DAYS} THEN 'expiring'
+    ELSE 'ok' END"""
+_DUES_NOW = DUES_STATE_SQL.format(today="date('now', 'localtime')")
+
+# Ordered, append-only. Each step is a list of statements or a callable(conn); it runs
+# in its own transaction and is recorded in schema_migrations. Never edit a shipped step.
+MIGRATIONS = [
+    (1, "base schema", init_db),
+    (2, "hot lookup indexes", [
+        "CREATE INDEX IF NOT EXISTS ix_students_status ON students (status)",
+        "CREATE INDEX IF NOT EXISTS ix_students_due_date ON students (due_date)",
+        "CREATE INDEX IF NOT EXISTS ix_students_seat ON students (assigned_seat_id)",
+        "CREATE INDEX IF NOT EXISTS ix_students_approval ON students (is_profile_approved, is_seat_approved)",
+        "CREATE INDEX IF NOT EXISTS ix_complaints_student_status ON complaints (student_id, status)",
+        "CREATE INDEX IF NOT EXISTS ix_study_logs_student_date ON study_logs (student_id, date)",
+    ]),
+    (3, "notification dedupe", [
+        # Older builds could race past the SELECT-then-INSERT check; keep the first copy.
+        "DELETE FROM notifications WHERE id NOT IN (SELECT min(id) FROM notifications GROUP BY student_id, date, message)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_notifications_dedupe ON notifications (student_id, date, message)",
+    ]),
+    (4, "seat layout and seatmap version", [
+        "ALTER TABLE seats ADD COLUMN floor INTEGER DEFAULT 1",
+        "ALTER TABLE seats ADD COLUMN row_no INTEGER",
+        "ALTER TABLE seats ADD COLUMN col_no INTEGER",
+        # The legacy map drew seats ten to a row in seat_id order
+        "UPDATE seats SET floor=coalesce(floor, 1), row_no=(seat_id-1)/10, col_no=(seat_id-1)%10 WHERE row_no IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_seats_layout ON seats (floor, row_no, col_no)",
+        "CREATE TABLE IF NOT EXISTS data_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)",
+        "INSERT OR IGNORE INTO data_versions VALUES ('seatmap', 0)",
+        """CREATE TRIGGER IF NOT EXISTS trg_seats_ins_seatmap AFTER INSERT ON seats BEGIN
+            UPDATE seats SET floor=coalesce(NEW.floor, 1), row_no=(NEW.seat_id-1)/10, col_no=(NEW.seat_id-1)%10 WHERE seat_id=NEW.seat_id AND NEW.row_no IS NULL;
+            UPDATE data_versions SET version=version+1 WHERE name='seatmap'; END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_seats_upd_seatmap AFTER UPDATE ON seats BEGIN
+            UPDATE data_versions SET version=version+1 WHERE name='seatmap'; END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_seats_del_seatmap AFTER DELETE ON seats BEGIN
+            UPDATE data_versions SET version=version+1 WHERE name='seatmap'; END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_students_ins_seatmap AFTER INSERT ON students WHEN NEW.assigned_seat_id IS NOT NULL BEGIN
+            UPDATE data_versions SET version=version+1 WHERE name='seatmap'; END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_students_upd_seatmap AFTER UPDATE OF assigned_seat_id, due_date ON students
+            WHEN OLD.assigned_seat_id IS NOT NEW.assigned_seat_id OR (NEW.assigned_seat_id IS NOT NULL AND OLD.due_date IS NOT NEW.due_date) BEGIN
+            UPDATE data_versions SET version=version+1 WHERE name='seatmap'; END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_students_del_seatmap AFTER DELETE ON students WHEN OLD.assigned_seat_id IS NOT NULL BEGIN
+            UPDATE data_versions SET version=version+1 WHERE name='seatmap'; END""",
+    ]),
+    (5, "student search index", [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(name, phone, father_name, exam, content='students', content_rowid='student_id')",
+        "INSERT INTO students_fts (students_fts) VALUES ('rebuild')",
+        """CREATE TRIGGER IF NOT EXISTS trg_students_fts_ins AFTER INSERT ON students BEGIN
+            INSERT INTO students_fts (rowid, name, phone, father_name, exam) VALUES (NEW.student_id, NEW.name, NEW.phone, NEW.father_name, NEW.exam); END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_students_fts_del AFTER DELETE ON students BEGIN
+            INSERT INTO students_fts (students_fts, rowid, name, phone, father_name, exam) VALUES ('delete', OLD.student_id, OLD.name, OLD.phone, OLD.father_name, OLD.exam); END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_students_fts_upd AFTER UPDATE OF name, phone, father_name, exam ON students BEGIN
+            INSERT INTO students_fts (students_fts, rowid, name, phone, father_name, exam) VALUES ('delete', OLD.student_id, OLD.name, OLD.phone, OLD.father_name, OLD.exam);
+            INSERT INTO students_fts (rowid, name, phone, father_name, exam) VALUES (NEW.student_id, NEW.name, NEW.phone, NEW.father_name, NEW.exam); END""",
+    ]),
+    (6, "finance rollups", [
+        "CREATE TABLE IF NOT EXISTS finance_daily (day DATE, kind TEXT, bucket TEXT, amount REAL, entries INTEGER, PRIMARY KEY (day, kind, bucket))",
+        "CREATE TABLE IF NOT EXISTS finance_monthly (month TEXT, kind TEXT, bucket TEXT, amount REAL, entries INTEGER, PRIMARY KEY (month, kind, bucket))",
+        "INSERT OR IGNORE INTO data_versions VALUES ('finance', 0)",
+        *_rollup_triggers('income'), *_rollup_triggers('expenses'),
+        *ROLLUP_REBUILD,
+    ]),
+    (7, "stored dues state", [
+        "ALTER TABLE students ADD COLUMN dues_state TEXT DEFAULT 'ok'",
+        f"UPDATE students SET dues_state = {_DUES_NOW}",
+        "CREATE INDEX IF NOT EXISTS ix_students_dues_state ON students (dues_state)",
+        # Row edits (renew, terminate, lock, mercy days) take effect at once; the batch
+        # engine in dues.py handles the passage of time.
+        f"""CREATE TRIGGER IF NOT EXISTS trg_students_ins_dues AFTER INSERT ON students BEGIN
+            UPDATE students SET dues_state = {_DUES_NOW} WHERE student_id = NEW.student_id; END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_students_upd_dues AFTER UPDATE OF status, due_date, mercy_days ON students BEGIN
+            UPDATE students SET dues_state = {_DUES_NOW} WHERE student_id = NEW.student_id; END""",
+    ]),
+    (8, "locker requests", [
+        "ALTER TABLE students ADD COLUMN wants_locker INTEGER DEFAULT 0",
+    ]),
+    (9, "study analytics", [
+        "CREATE TABLE IF NOT EXISTS study_daily (student_id INTEGER NOT NULL, date DATE NOT NULL, minutes INTEGER, sessions INTEGER, PRIMARY KEY (student_id, date)) WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS ix_study_daily_date ON study_daily (date, student_id, minutes)",
+        "CREATE INDEX IF NOT EXISTS ix_students_status_xp ON students (status, xp_points)",
+        f"CREATE TRIGGER IF NOT EXISTS trg_study_logs_ins_daily AFTER INSERT ON study_logs BEGIN {_study_apply('NEW', '')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_study_logs_del_daily AFTER DELETE ON study_logs BEGIN {_study_apply('OLD', '-')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_study_logs_upd_daily AFTER UPDATE OF student_id, date, duration_minutes ON study_logs BEGIN "
+        f"{_study_apply('OLD', '-')} {_study_apply('NEW', '')} END",
+        *STUDY_REBUILD,
+    ]),
+    (10, "content-addressed documents", docstore.migrate_legacy),
+    (11, "student row versions", [
+        "ALTER TABLE students ADD COLUMN row_version INTEGER DEFAULT 0",
+        # Fires for every column but row_version itself (recursive triggers are off)
+        """CREATE TRIGGER IF NOT EXISTS trg_students_upd_version AFTER UPDATE ON students BEGIN
+            UPDATE students SET row_version = coalesce(OLD.row_version, 0) + 1 WHERE student_id = NEW.student_id; END""",
+    ]),
+    (12, "outbox", [
+        # status: queued -> sending (claimed by a worker) -> sent, or back to queued with a
+        # later next_attempt_at, or failed after outbox.MAX_ATTEMPTS. Times are unix seconds.
+        """CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, student_id INTEGER,
+            recipient TEXT, message TEXT NOT NULL, idem_key TEXT NOT NULL UNIQUE, status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL DEFAULT 0, claimed_by TEXT, claimed_at REAL,
+            last_error TEXT, created_at TIMESTAMP, sent_at TIMESTAMP)""",
+        "CREATE INDEX IF NOT EXISTS ix_outbox_due ON outbox (channel, next_attempt_at, id) WHERE status = 'queued'",
+        "CREATE INDEX IF NOT EXISTS ix_outbox_claimed ON outbox (claimed_at) WHERE status = 'sending'",
+    ]),
+    (13, "database identity", [
+        # Random per database file, so anything that leaves it (outbox idempotency keys) cannot
+        # collide with another branch's rows, which are numbered from 1 as well
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+        "INSERT OR IGNORE INTO meta (key, value) VALUES ('db_id', lower(hex(randomblob(8))))",
+    ]),
+    (14, "outbox status index", [
+        # Covers outbox.stats() (GROUP BY status, channel) and the workers' purge of old sent rows
+        "CREATE INDEX IF NOT EXISTS ix_outbox_status ON outbox (status, channel, sent_at)",
+    ]),
+]
+LATEST = MIGRATIONS[-1][0]
+
+_current = set()  # database paths already at LATEST in this process
+
+def migrate(path=None):
+    """Bring the database at `path` up to LATEST. Cheap once it is current."""
+    path = path or DB_NAME
+    if path in _current: return
+    folder = os.path.dirname(path)
+    if folder: os.makedirs(folder, exist_ok=True)
+    conn = get_db(path)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, name TEXT, applied_at TIMESTAMP)")
+        if (conn.execute("SELECT max(version) FROM schema_migrations").fetchone()[0] or 0) < LATEST:
+            for version, name, step in MIGRATIONS:
+                conn.execute("BEGIN IMMEDIATE")  # one process migrates, the others wait and then skip
+                if conn.execute("SELECT 1 FROM schema_migrations WHERE version=?", (version,)).fetchone():
+                    conn.rollback(); continue
+                if callable(step): step(conn)
+                else:
+                    for sql in step: conn.execute(sql)
+                conn.execute("INSERT INTO schema_migrations VALUES (?,?,?)", (version, name, datetime.now()))
+                conn.commit()
+        _current.add(path)
+    finally: conn.close()
@@ -0,0 +1,59 @@
+from datetime import date
+
+from db import data_version
+
+# ==========================================
+# SEAT SNAPSHOT (LIVE FLOOR PLAN)
+# ==========================================
+EXPIRING_DAYS = 7
+BADGES = {'expired': "🔴", 'expiring': "🟠", 'safe': "🔵"}
+
+# One pass over seats LEFT JOIN students; state is classified in SQL. max() picks one
+# occupant per seat, and SQLite returns the bare columns from that same row.
+SNAPSHOT_SQL = """
+SELECT s.seat_id, s.seat_label, coalesce(s.floor, 1), coalesce(s.row_no, 0), coalesce(s.col_no, 0), max(st.student_id),
+       CASE WHEN max(st.student_id) IS NULL THEN 'available'
+            WHEN julianday(st.due_date) IS NULL THEN 'occupied'
+            WHEN julianday(st.due_date) < julianday(:today) THEN 'expired'
+            WHEN julianday(st.due_date) - julianday(:today) < :expiring THEN 'expiring'
+            ELSE 'safe' END
+FROM seats s LEFT JOIN students st ON st.assigned_seat_id = s.seat_id
+GROUP BY s.seat_id
+"""
+
+_cache = {}  # db path -> (seatmap version, day, snapshot)
+
+def build_snapshot(conn, today=None):
+    """{'floors': {floor: rows of cells or None}, 'counts': {state: n}, 'occupant': {seat_id: student_id}}.
+    A cell is (seat_id, seat_label, state, student_id)."""
+    today = today or date.today()
+    rows = conn.execute(SNAPSHOT_SQL, {'today': str(today), 'expiring': EXPIRING_DAYS}).fetchall()
+    shape = {}
+    for _, _, floor, r, c, _, _ in rows:
+        h, w = shape.get(floor, (0, 0))
+        shape[floor] = (max(h, r + 1), max(w, c + 1))
+    floors = {f: [[None] * w for _ in range(h)] for f, (h, w) in shape.items()}
+    counts, occupant = {}, {}
+    for seat_id, label, floor, r, c, student_id, state in rows:
+        floors[floor][r][c] = (seat_id, label, state, student_id)
+        counts[state] = counts.get(state, 0) + 1
+        if student_id is not None: occupant[seat_id] = student_id
+    return {'floors': floors, 'counts': counts, 'occupant': occupant}
+
+def snapshot(conn):
+    """Cached build_snapshot(); rebuilt only when seats, assignments or due dates change (or the day rolls over)."""
+    key = (data_version(conn, 'seatmap'), date.today())
+    hit = _cache.get(conn.path)
+    if hit and hit[0] == key: return hit[1]
+    snap = build_snapshot(conn, key[1])
+    _cache[conn.path] = (key, snap)
+    return snap
+
+def add_floor(conn, floor, rows, cols, prefix, locker_every=5):
+    """Create a rows x cols block of seats labelled {prefix}-1.. on `floor`. If the floor already
+    has seats the block goes below its last row, so no grid cell is taken twice. Caller commits."""
+    top = conn.execute("SELECT coalesce(max(row_no) + 1, 0) FROM seats WHERE coalesce(floor, 1)=?", (floor,)).fetchone()[0]
+    seats = [(f"{prefix}-{r * cols + c + 1}", 1 if (r * cols + c + 1) % locker_every == 0 else 0, 'Available', floor, top + r, c)
+             for r in range(rows) for c in range(cols)]
+    conn.executemany("INSERT INTO seats (seat_label, has_locker, status, floor, row_no, col_no) VALUES (?,?,?,?,?,?)", seats)
+    return len(seats)
@@ -0,0 +1,44 @@
+from datetime import date
+
+# ==========================================
+# STUDENT RECORDS
+# ==========================================
+# Pages hold a Student instead of a raw `SELECT *` tuple. students.row_version is bumped
+# by a trigger on every write to the row (renew, XP, seat, dues state...), so refresh()
+# can ask for the row only if it changed and otherwise keep the cached record.
+FIELDS = ('student_id', 'name', 'phone', 'exam', 'father_name', 'photo_path', 'govt_id_path', 'due_date', 'status',
+          'dues_state', 'is_profile_approved', 'is_seat_approved', 'assigned_seat_id', 'seat_label', 'mercy_days',
+          'xp_points', 'row_version')
+
+SELECT_SQL = ("SELECT s.student_id, s.name, s.phone, s.exam, s.father_name, s.photo_path, s.govt_id_path, s.due_date, s.status, "
+              "s.dues_state, s.is_profile_approved, s.is_seat_approved, s.assigned_seat_id, st.seat_label, s.mercy_days, "
+              "s.xp_points, s.row_version FROM students s LEFT JOIN seats st ON st.seat_id = s.assigned_seat_id")
+
+class Student:
+    __slots__ = FIELDS + ('due',)
+
+    def __init__(self, row):
+        for k, v in zip(FIELDS, row): setattr(self, k, v)
+        try: self.due = date.fromisoformat(str(self.due_date))
+        except ValueError: self.due = None
+
+    def days_left(self, today=None):
+        return (self.due - (today or date.today())).days if self.due else None
+
+    def __repr__(self):
+        return f"Student({self.student_id}, {self.name!r}, v{self.row_version})"
+
+def load(conn, student_id):
+    row = conn.execute(f"{SELECT_SQL} WHERE s.student_id=?", (student_id,)).fetchone()
+    return Student(row) if row else None
+
+def login(conn, phone, password):
+    row = conn.execute(f"{SELECT_SQL} WHERE s.phone=? AND s.password=?", (phone, password)).fetchone()
+    return Student(row) if row else None
+
+def refresh(conn, cached):
+    """Read-through: `cached` itself while its row_version is current, else the re-read row
+    (None if the student is gone). The unchanged case is one primary-key probe."""
+    row = conn.execute("SELECT row_version FROM students WHERE student_id=?", (cached.student_id,)).fetchone()
+    if row is None: return None
+    return cached if row[0] == cached.row_version else load(conn, cached.student_id)
@@ -0,0 +1,83 @@
+from datetime import date, timedelta
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from db import immediate
+from schema import STUDY_REBUILD
+
+# ==========================================
+# STUDY ANALYTICS
+# ==========================================
+# study_daily holds one row per student per day. Triggers on study_logs (schema migration 9)
+# keep it current when a Focus session is saved, so nothing here reads study_logs.
+DEFAULT_TARGET_HOURS = 6
+
+def rebuild(conn):
+    with immediate(conn):
+        for sql in STUDY_REBUILD: conn.execute(sql)
+
+def daily(conn, student_id, since):
+    rows = conn.execute("SELECT date, minutes FROM study_daily WHERE student_id=? AND date >= ? ORDER BY date", (student_id, str(since))).fetchall()
+    return pd.DataFrame(rows, columns=['date', 'minutes'])
+
+def streaks(days, today=None):
+    """(current, longest) run of consecutive study days. `days` are ISO dates with minutes > 0.
+    The current streak survives until the end of the day after the last session."""
+    if len(days) == 0: return 0, 0
+    d = np.unique(pd.to_datetime(pd.Series(days)).values.astype('datetime64[D]').astype(np.int64))
+    run_id = np.concatenate(([0], np.cumsum(np.diff(d) != 1)))
+    runs = np.bincount(run_id)
+    today = np.datetime64(today or date.today(), 'D').astype(np.int64)
+    return int(runs[-1]) if d[-1] >= today - 1 else 0, int(runs.max())
+
+def target_hours(conn, student_id):
+    row = conn.execute("SELECT daily_target_hours FROM student_targets WHERE student_id=?", (student_id,)).fetchone()
+    return row[0] if row and row[0] else DEFAULT_TARGET_HOURS
+
+def set_target(conn, student_id, hours):
+    conn.execute("INSERT INTO student_targets (student_id, daily_target_hours) VALUES (?,?) "
+                 "ON CONFLICT (student_id) DO UPDATE SET daily_target_hours = excluded.daily_target_hours", (student_id, hours))
+
+def summary(conn, student_id, weeks=12, today=None):
+    """Everything the Focus OS tab shows for one student, from two primary-key range reads."""
+    today = today or date.today()
+    frame = daily(conn, student_id, today - timedelta(days=7 * weeks - 1))
+    all_days = [r[0] for r in conn.execute("SELECT date FROM study_daily WHERE student_id=? AND minutes > 0 ORDER BY date", (student_id,))]
+    current, longest = streaks(all_days, today)
+    target = target_hours(conn, student_id) * 60
+    minutes = frame.set_index('date')['minutes']
+    last7 = minutes[minutes.index >= str(today - timedelta(days=6))]
+    return {'frame': frame, 'today_minutes': int(minutes.get(str(today), 0)), 'target_minutes': target,
+            'current_streak': current, 'longest_streak': longest,
+            'week_minutes': int(last7.sum()), 'week_target_days': int((last7 >= target).sum())}
+
+def heatmap_chart(frame, weeks=12, today=None):
+    """GitHub-style grid: one column per week, one row per weekday, coloured by minutes."""
+    today = today or date.today()
+    start = today - timedelta(days=7 * weeks - 1)
+    grid = pd.DataFrame({'date': pd.date_range(start, today)})
+    grid = grid.merge(frame.assign(date=pd.to_datetime(frame['date'])), on='date', how='left').fillna({'minutes': 0})
+    grid['week'] = grid['date'].dt.to_period('W-SUN').dt.start_time.dt.strftime('%d %b')
+    grid['day'] = grid['date'].dt.strftime('%a')
+    grid['hours'] = (grid['minutes'] / 60).round(1)
+    return alt.Chart(grid).mark_rect(cornerRadius=2).encode(
+        x=alt.X('week:O', title=None, sort=None), y=alt.Y('day:O', title=None, sort=['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']),
+        color=alt.Color('hours:Q', scale=alt.Scale(scheme='greens'), legend=None),
+        tooltip=[alt.Tooltip('date:T'), 'hours:Q']).properties(height=180)
+
+# ---- library-wide ----
+def leaderboard(conn, n=10):
+    """Top `n` active students by XP; walks ix_students_status_xp from the top."""
+    return conn.execute("SELECT name, exam, xp_points FROM students WHERE status='Active' ORDER BY xp_points DESC LIMIT ?", (n,)).fetchall()
+
+def xp_rank(conn, xp):
+    return conn.execute("SELECT count(*) + 1 FROM students WHERE xp_points > ? AND status='Active'", (xp,)).fetchone()[0]
+
+def weekly_leaderboard(conn, n=10, days=7, today=None):
+    """Top `n` by minutes studied in the last `days` days; a covering scan of ix_study_daily_date."""
+    since = str((today or date.today()) - timedelta(days=days - 1))
+    return conn.execute("""SELECT s.name, s.exam, d.minutes FROM
+        (SELECT student_id, sum(minutes) AS minutes FROM study_daily INDEXED BY ix_study_daily_date WHERE date >= ? GROUP BY student_id ORDER BY minutes DESC LIMIT ?) d
+        JOIN students s ON s.student_id = d.student_id ORDER BY d.minutes DESC""", (since, n)).fetchall()